@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网易云音乐礼品卡异步分析器
+基于 asyncio + aiohttp，单事件循环、单连接池即可维持数千个并发请求
+"""
+
+import asyncio
+import time
+
+import aiohttp
+
+from link_resolution import LinkResolution, normalize_short_url
+from optimal_gift_analyzer import OptimalGiftAnalyzer
+from flow_control import parse_retry_after, AsyncSingleFlight
+from serializers import json_loads
+
+
+class AsyncGiftAnalyzer:
+    """异步礼品卡分析器 - 与 OptimalGiftAnalyzer.analyze_gift_link 逻辑一致"""
+
+    def __init__(self, max_concurrency=1000, timeout=10, session=None, analyzer=None, key_pool_size=64,
+                 redirect_cache=None, result_cache=None, rate_limiter=None, retry_policy=None,
+                 hedge_policy=None, keep_api_response=False, gift_cache=None):
+        # 复用同步分析器的参数提取、响应解析、加密逻辑、缓存、限速器、重试及对冲策略
+        self.analyzer = analyzer or OptimalGiftAnalyzer(
+            key_pool_size=key_pool_size, redirect_cache=redirect_cache, result_cache=result_cache,
+            rate_limiter=rate_limiter, retry_policy=retry_policy, hedge_policy=hedge_policy,
+            keep_api_response=keep_api_response, gift_cache=gift_cache
+        )
+        self.encryption = self.analyzer.encryption
+        self.api_url = self.analyzer.api_url
+        self.headers = dict(self.analyzer.session.headers)
+
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.client_timeout = aiohttp.ClientTimeout(total=timeout)
+        # 合并同一短链接的并发分析
+        self.single_flight = AsyncSingleFlight()
+        # 按礼品卡身份合并API调用，结果缓存（如有）与同步分析器共享
+        self.gift_flight = AsyncSingleFlight()
+
+        # 外部传入的会话由调用方负责关闭
+        self.session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        await self.create_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close_session()
+
+    async def create_session(self):
+        """创建共享的异步HTTP会话（单连接池）"""
+        if not self.session or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.client_timeout)
+            self._owns_session = True
+        return self.session
+
+    def use_session(self, session):
+        """改用外部共享的会话（由调用方负责关闭）"""
+        self.session = session
+        self._owns_session = False
+
+    async def close_session(self):
+        """关闭HTTP会话"""
+        if self.session and self._owns_session:
+            await self.session.close()
+        self.session = None
+
+    async def throttle(self, url):
+        """按目标主机限速（不阻塞事件循环）"""
+        if self.analyzer.rate_limiter:
+            await self.analyzer.rate_limiter.acquire_async(url)
+
+    def classify_exception(self, exception):
+        """将aiohttp异常映射为与同步分析器一致的异常分类"""
+        if isinstance(exception, asyncio.TimeoutError):
+            category, message = 'timeout', '请求超时'
+        elif isinstance(exception, aiohttp.ClientSSLError):
+            category, message = 'ssl_error', 'SSL证书错误'
+        elif isinstance(exception, aiohttp.ClientConnectionError):
+            category, message = 'connection_error', '网络连接失败'
+        elif isinstance(exception, aiohttp.TooManyRedirects):
+            category, message = 'redirect_error', '重定向次数过多'
+        elif isinstance(exception, aiohttp.ClientResponseError):
+            category, message = 'http_error', 'HTTP请求错误'
+        elif isinstance(exception, aiohttp.ClientError):
+            category, message = 'request_error', '请求异常'
+        else:
+            return self.analyzer.classify_exception(exception)
+
+        return {
+            'error_type': 'api_exception',
+            'error_category': category,
+            'error_message': message,
+            'technical_details': str(exception) or type(exception).__name__
+        }
+
+    async def call_gift_api(self, gift_params, encrypted_data=None):
+        """异步调用礼品卡API"""
+        if encrypted_data is None:
+            encrypted_data = self.encryption.encrypt_params(self.analyzer.build_gift_payload(gift_params))
+
+        status, retry_after, body = await self.post_gift_api(encrypted_data)
+        if status != 200:
+            result = self.analyzer.build_api_status_result(status)
+            retry_after = parse_retry_after(retry_after)
+            if retry_after is not None:
+                result['retry_after'] = retry_after
+            return result
+
+        try:
+            result = json_loads(body)
+        except ValueError as e:
+            return self.analyzer.build_json_error_result(e)
+        return self.analyzer.parse_api_response(result, gift_params)
+
+    async def call_gift_api_deduped(self, gift_params):
+        """按礼品卡身份调用API，同一张礼品卡只查询一次，结果分发给所有别名链接"""
+        identity = self.analyzer.gift_identity(gift_params)
+        cached = self.analyzer.get_cached_gift(identity)
+        if cached is not None:
+            return self.analyzer.refresh_status(cached)
+
+        result, _ = await self.gift_flight.do(identity, self.call_and_cache_gift_api, identity, gift_params)
+        return dict(result)
+
+    async def call_and_cache_gift_api(self, identity, gift_params):
+        """调用礼品卡API并按礼品卡身份缓存结果"""
+        result = await self.call_gift_api(gift_params)
+        if self.analyzer.gift_cache is not None:
+            self.analyzer.gift_cache.put(identity, result)
+        return result
+
+    async def post_gift_api_once(self, encrypted_data):
+        """发送一次礼品卡API请求，返回 (状态码, Retry-After, 响应体)"""
+        session = await self.create_session()
+        await self.throttle(self.api_url)
+        async with session.post(self.api_url, data=encrypted_data, headers=self.headers,
+                                timeout=self.client_timeout) as response:
+            body = await response.read() if response.status == 200 else b''
+            return response.status, response.headers.get('Retry-After'), body
+
+    async def post_gift_api(self, encrypted_data):
+        """发送礼品卡API请求，配置了对冲策略时对慢请求补发副本，取先返回的响应并取消另一个"""
+        policy = self.analyzer.hedge_policy
+        if not policy:
+            return await self.post_gift_api_once(encrypted_data)
+
+        policy.record_request()
+        delay = policy.hedge_delay()
+        start = time.monotonic()
+        if delay is None:
+            response = await self.post_gift_api_once(encrypted_data)
+            policy.record_latency(time.monotonic() - start)
+            return response
+
+        primary = asyncio.ensure_future(self.post_gift_api_once(encrypted_data))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not policy.try_hedge():
+            response = await primary
+            policy.record_latency(time.monotonic() - start)
+            return response
+
+        hedge = asyncio.ensure_future(self.post_gift_api_once(encrypted_data))
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            policy.record_hedge_win()
+                        policy.record_latency(time.monotonic() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def resolve_short_link(self, short_url):
+        """解析短链接重定向（只发送一次HEAD请求），请求异常记录在 error 字段中"""
+        redirect_cache = self.analyzer.redirect_cache
+        # SQLite 是同步调用，放到线程池中执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        if redirect_cache:
+            cached = await loop.run_in_executor(None, redirect_cache.get, short_url)
+            if cached:
+                return LinkResolution(short_url, *cached)
+
+        try:
+            session = await self.create_session()
+            await self.throttle(short_url)
+            async with session.head(short_url, allow_redirects=False, headers=self.headers,
+                                    timeout=self.client_timeout) as resp:
+                resolution = LinkResolution(short_url, resp.status, resp.headers.get('Location'))
+        except Exception as e:
+            return LinkResolution(short_url, error=e)
+
+        if redirect_cache:
+            await loop.run_in_executor(None, self.analyzer.store_resolution, resolution)
+        return resolution
+
+    async def analyze_gift_link(self, short_url, resolution=None, check_cache=True):
+        """分析单个礼品链接，传入 resolution 时不再重复解析重定向"""
+        if check_cache:
+            cached = self.analyzer.lookup_cached_result(short_url)
+            if cached is not None:
+                return cached
+
+        result, _ = await self.single_flight.do(
+            normalize_short_url(short_url), self.fetch_and_cache_gift_link, short_url, resolution
+        )
+        # 并发调用方共享同一结果，各自拿到独立副本并保留自己的原始链接
+        result = dict(result)
+        result['short_url'] = short_url
+        return result
+
+    async def fetch_and_cache_gift_link(self, short_url, resolution=None):
+        """通过网络分析礼品链接并写入结果缓存"""
+        result = await self.fetch_gift_link(short_url, resolution)
+        if self.analyzer.result_cache:
+            self.analyzer.result_cache.put(short_url, result)
+        return result
+
+    async def fetch_gift_link(self, short_url, resolution=None):
+        """通过网络分析单个礼品链接（不经过结果缓存），临时性错误按重试策略自动重试"""
+        policy = self.analyzer.retry_policy
+        if not policy:
+            return await self.fetch_gift_link_once(short_url, resolution)
+
+        attempt = 1
+        total_backoff = 0.0
+        while True:
+            # 重定向只在尚未成功解析时请求，API阶段失败重试时复用
+            if resolution is None:
+                resolution = await self.resolve_short_link(short_url)
+            policy.record_attempt()
+            result = await self.fetch_gift_link_once(short_url, resolution)
+            if not policy.should_retry(result, attempt):
+                break
+
+            delay = policy.backoff(attempt, result.get('retry_after'))
+            await asyncio.sleep(delay)
+            total_backoff += delay
+            attempt += 1
+            if resolution.error or resolution.status_code not in [301, 302]:
+                resolution = None
+
+        result['retry_count'] = attempt - 1
+        result['retry_backoff'] = round(total_backoff, 3)
+        return result
+
+    async def fetch_gift_link_once(self, short_url, resolution=None):
+        """通过网络分析单个礼品链接（单次尝试）"""
+        try:
+            # 第一步：获取重定向链接
+            if resolution is None:
+                resolution = await self.resolve_short_link(short_url)
+            if resolution.error:
+                raise resolution.error
+
+            status_code = resolution.status_code
+            redirect_url = resolution.location
+
+            if status_code not in [301, 302]:
+                return self.analyzer.build_redirect_error_result(status_code)
+
+            if not redirect_url:
+                return {
+                    "status": "invalid",
+                    "message": "短链接缺少重定向信息"
+                }
+
+            if 'gift-receive' not in redirect_url:
+                return {
+                    "status": "invalid",
+                    "message": "不是礼品卡链接"
+                }
+
+            # 第二步：提取礼品卡参数
+            gift_params = self.analyzer.extract_gift_params(redirect_url)
+            if not gift_params:
+                return {
+                    "status": "error",
+                    "message": "参数提取失败"
+                }
+
+            # 第三步：调用API获取状态
+            api_result = await self.call_gift_api_deduped(gift_params)
+            # 本链接实际发送了请求，按礼品卡身份命中缓存也不算缓存结果（并发控制据此采样延迟）
+            api_result.pop('from_cache', None)
+
+            # 添加原始信息
+            api_result['short_url'] = short_url
+            api_result['redirect_url'] = redirect_url
+
+            return api_result
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error_info = self.classify_exception(e)
+            return {
+                "status": "api_exception",
+                "short_url": short_url,
+                "message": error_info['error_message'],
+                **error_info
+            }
+        except Exception as e:
+            error_info = self.classify_exception(e)
+            return {
+                "status": "system_exception",
+                "short_url": short_url,
+                "message": f"系统异常: {str(e)}",
+                **error_info
+            }
+
+    async def batch_analyze(self, short_urls, max_concurrency=None):
+        """批量分析礼品链接，按完成顺序逐个产出结果
+
+        short_urls 可以是任意可迭代对象（包括生成器），链接按需取出，
+        不会一次性为所有链接创建任务。
+        """
+        concurrency = max_concurrency or self.max_concurrency
+        await self.create_session()
+
+        url_iter = iter(short_urls)
+        queue = asyncio.Queue(maxsize=concurrency * 2)
+        worker_done = object()
+
+        async def worker():
+            cancelled = False
+            try:
+                # 所有worker共享同一个迭代器，单线程事件循环中 next() 是安全的
+                for url in url_iter:
+                    try:
+                        result = await self.analyze_gift_link(url)
+                    except Exception as e:
+                        result = {
+                            'status': 'error',
+                            'short_url': url,
+                            'message': str(e)
+                        }
+                    await queue.put(result)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # 被取消说明消费者已停止读取，队列可能已满，不再放入结束标记
+                if not cancelled:
+                    await queue.put(worker_done)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        finished = 0
+        try:
+            while finished < len(workers):
+                item = await queue.get()
+                if item is worker_done:
+                    finished += 1
+                    continue
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def analyze_links(self, short_urls, max_concurrency=None):
+        """批量分析并返回全部结果列表"""
+        return [result async for result in self.batch_analyze(short_urls, max_concurrency)]
+
+
+async def _main(links, max_concurrency):
+    total = len(links)
+    results = []
+    async with AsyncGiftAnalyzer(max_concurrency=max_concurrency) as async_analyzer:
+        async for result in async_analyzer.batch_analyze(links):
+            results.append(result)
+            url = result.get('short_url', '')
+            if result['status'] == 'success':
+                print(f"[✅ {len(results)}/{total}] {url} → {result.get('status_text', 'Unknown')} | "
+                      f"{result.get('gift_type', '')} | {result.get('sender_name', '')}")
+            else:
+                print(f"[❌ {len(results)}/{total}] {url} → {result.get('message', 'Error')}")
+        return results, async_analyzer.analyzer
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='网易云音乐礼品卡异步分析器')
+    parser.add_argument('input', nargs='?', default='gift_links.txt', help='链接文件（每行一个）')
+    parser.add_argument('--concurrency', type=int, default=500, help='最大并发请求数')
+    parser.add_argument('--output', default='gift_analysis_results.json', help='结果保存路径（.msgpack 扩展名保存为二进制格式）')
+
+    args = parser.parse_args()
+
+    try:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            links = [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        print(f"未找到 {args.input} 文件")
+    else:
+        print(f"[🚀 开始分析] 共 {len(links)} 个链接，最大并发 {args.concurrency}")
+        batch_results, sync_analyzer = asyncio.run(_main(links, args.concurrency))
+        sync_analyzer.save_results(batch_results, args.output)
+        sync_analyzer.print_statistics(batch_results)
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网易云音乐加密工具基准测试
+测量 NetEaseEncryption 各步骤的单次延迟、吞吐量以及多线程扩展性
+"""
+
+import json
+import random
+import statistics
+import threading
+import time
+
+from optimal_gift_analyzer import NetEaseEncryption
+
+# 固定的示例payload，与 call_gift_api 构造的数据结构一致
+SAMPLE_PAYLOAD = json.dumps({
+    'd': 'a1b2c3d4e5f6a7b8c9d0',
+    'p': '0123456789abcdef',
+    'userid': '123456789',
+    'app_version': '9.1.80',
+    'dlt': '0846',
+    'csrf_token': ''
+})
+
+DEFAULT_THREADS = [1, 4, 16, 64]
+
+
+def build_cases(encryption, payload=SAMPLE_PAYLOAD, seed=None):
+    """构造待测函数，返回 {名称: 无参可调用对象}"""
+    key = encryption.create_random_string(16)
+    if seed is not None:
+        # 确定性模式下固定AES/RSA的输入
+        key = ''.join(random.Random(seed).sample(encryption.character, 16))
+
+    return {
+        'create_random_string': lambda: encryption.create_random_string(16),
+        'aes_encrypt': lambda: encryption.aes_encrypt(payload, key),
+        'rsa_encrypt': lambda: encryption.rsa_encrypt(key, encryption.public_key, encryption.modulus),
+        'encrypt_params': lambda: encryption.encrypt_params(payload),
+    }
+
+
+def measure_latency(func, iterations, warmup=10):
+    """测量单次调用延迟（微秒）"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'mean_us': statistics.fmean(samples),
+        'median_us': samples[len(samples) // 2],
+        'p95_us': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'min_us': samples[0],
+        'calls_per_sec': 1e6 / statistics.fmean(samples) if samples else 0,
+    }
+
+
+def measure_threaded(func, threads, calls_per_thread):
+    """测量多线程下的总吞吐量（calls/s）"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(calls_per_thread):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total_calls = threads * calls_per_thread
+    return {
+        'threads': threads,
+        'total_calls': total_calls,
+        'elapsed_sec': elapsed,
+        'calls_per_sec': total_calls / elapsed if elapsed > 0 else 0,
+    }
+
+
+def run_benchmark(iterations=1000, thread_counts=None, calls_per_thread=None,
+                  seed=None, key_pool_size=0, cases=None):
+    """运行完整基准测试并返回结果字典"""
+    thread_counts = thread_counts or DEFAULT_THREADS
+    calls_per_thread = calls_per_thread or max(1, iterations // 4)
+
+    if seed is not None:
+        random.seed(seed)
+
+    # 关闭第一阶段缓存，测量真实的加密开销
+    encryption = NetEaseEncryption(key_pool_size=key_pool_size, first_stage_cache_size=0)
+    all_cases = build_cases(encryption, seed=seed)
+    if cases:
+        all_cases = {name: func for name, func in all_cases.items() if name in cases}
+
+    report = {
+        'seed': seed,
+        'key_pool_size': key_pool_size,
+        'results': {}
+    }
+
+    for name, func in all_cases.items():
+        if seed is not None:
+            # 每个用例重新播种，保证各用例输入序列可复现
+            random.seed(seed)
+
+        latency = measure_latency(func, iterations)
+        scaling = []
+        for threads in thread_counts:
+            scaling.append(measure_threaded(func, threads, calls_per_thread))
+
+        # 以单线程吞吐为基准计算加速比，观察GIL争用
+        base = scaling[0]['calls_per_sec'] if scaling else 0
+        for item in scaling:
+            item['speedup'] = item['calls_per_sec'] / base if base else 0
+
+        report['results'][name] = {
+            'latency': latency,
+            'scaling': scaling
+        }
+
+    return report
+
+
+def print_report(report):
+    """打印基准测试结果"""
+    print(f"\n[📊 加密基准测试] seed={report['seed']} key_pool_size={report['key_pool_size']}")
+    for name, data in report['results'].items():
+        latency = data['latency']
+        print(f"\n[🔐 {name}]")
+        print(f"单次延迟: 平均 {latency['mean_us']:.1f}µs | 中位数 {latency['median_us']:.1f}µs | "
+              f"p95 {latency['p95_us']:.1f}µs | 最小 {latency['min_us']:.1f}µs")
+        print(f"吞吐量: {latency['calls_per_sec']:.0f} calls/s")
+        for item in data['scaling']:
+            print(f"  {item['threads']:>3} 线程: {item['calls_per_sec']:>10.0f} calls/s "
+                  f"(加速比 {item['speedup']:.2f}x)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='网易云音乐加密工具基准测试')
+    parser.add_argument('--iterations', type=int, default=1000, help='单线程延迟测试的调用次数')
+    parser.add_argument('--threads', type=int, nargs='+', default=DEFAULT_THREADS, help='多线程测试的线程数')
+    parser.add_argument('--calls-per-thread', type=int, default=None, help='多线程测试中每个线程的调用次数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（确定性模式）')
+    parser.add_argument('--key-pool-size', type=int, default=0, help='启用密钥池并设置大小')
+    parser.add_argument('--case', action='append', dest='cases', help='只运行指定用例，可多次指定')
+    parser.add_argument('--json', dest='json_path', default=None, help='将结果保存为JSON文件')
+
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        iterations=args.iterations,
+        thread_counts=args.threads,
+        calls_per_thread=args.calls_per_thread,
+        seed=args.seed,
+        key_pool_size=args.key_pool_size,
+        cases=args.cases
+    )
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n[💾 保存完成] 结果已保存到 {args.json_path}")
@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+"""
+请求流量控制工具
+- AdaptiveConcurrencyController: 根据限流/超时/服务器错误自动调整并发数（AIMD）
+- TokenBucket / HostRateLimiter: 按主机的令牌桶限速，在所有线程/协程间共享
+- RetryPolicy / RetryBudget: 临时性错误的指数退避重试，全局重试预算防止故障时负载翻倍
+- CircuitBreaker / EndpointSelector: 多个备选接口的健康跟踪与熔断，优先使用最近成功的接口
+- HedgePolicy: 对冲请求策略，慢请求超过近期延迟分位数时补发一次副本
+- SingleFlight / AsyncSingleFlight: 合并同一键的并发请求，只执行一次并共享结果
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# 表示上游过载的错误分类，出现时降低并发
+CONGESTION_ERROR_CATEGORIES = ('rate_limit', 'timeout', 'server_error')
+
+# 可重试的临时性错误分类
+RETRYABLE_ERROR_CATEGORIES = ('timeout', 'connection_error', 'server_error', 'rate_limit')
+
+# 各主机默认限速 (每秒请求数, 突发容量)，None 表示不限速
+# 短链接重定向很轻量，不限速；weapi 和 VIP 详情接口按各自的容忍度限速
+DEFAULT_HOST_LIMITS = {
+    '163cn.tv': None,
+    'music.163.com': (20, 20),
+    'interface.music.163.com': (10, 10),
+}
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 响应头，返回等待秒数，无法解析时返回None"""
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class AdaptiveConcurrencyController:
+    """AIMD自适应并发控制器（线程安全）
+
+    - 加性增：请求成功且延迟正常时，每完成约 limit 个请求并发上限 +1
+    - 乘性减：遇到限流(429)、超时或5xx时并发上限乘以 decrease_factor
+    - 响应带 Retry-After 时，在指定时间内暂停发出新请求
+    """
+
+    def __init__(self, initial_limit=10, min_limit=1, max_limit=100,
+                 decrease_factor=0.5, latency_tolerance=2.0, decrease_cooldown=1.0):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance  # 延迟超过基线的倍数时不再增加并发
+        self.decrease_cooldown = decrease_cooldown  # 两次降低之间的最短间隔（秒），避免一波错误连续减半
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+
+        # 延迟统计（秒）
+        self.latency_ewma = None
+        self.latency_baseline = None
+
+        self.successes = 0
+        self.congestion_events = 0
+
+    @property
+    def current_limit(self):
+        """当前允许的并发数"""
+        return max(self.min_limit, int(self.limit))
+
+    def acquire(self, stop_event=None):
+        """获取一个并发槽位，超出并发上限或处于Retry-After暂停期时阻塞"""
+        with self.condition:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                wait_time = self.paused_until - time.monotonic()
+                if wait_time <= 0 and self.in_flight < self.current_limit:
+                    self.in_flight += 1
+                    return True
+                self.condition.wait(timeout=wait_time if wait_time > 0 else 0.5)
+
+    def release(self, result=None, latency=None):
+        """释放槽位并根据结果调整并发上限
+
+        Args:
+            result: 分析结果dict，根据 error_category / retry_after 判断是否拥塞
+            latency: 本次请求耗时（秒）
+        """
+        if not isinstance(result, Mapping):
+            result = {}
+        error_category = result.get('error_category')
+        retry_after = result.get('retry_after')
+
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            if result.get('from_cache'):
+                # 缓存命中没有访问上游，耗时接近0，不能作为延迟样本，也不代表上游有余量
+                pass
+            elif error_category in CONGESTION_ERROR_CATEGORIES:
+                self._on_congestion(retry_after)
+            else:
+                self._on_success(latency)
+            self.condition.notify_all()
+
+    def _on_success(self, latency):
+        self.successes += 1
+        if latency is not None:
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if self.latency_baseline is None or self.latency_ewma < self.latency_baseline:
+                self.latency_baseline = self.latency_ewma
+            # 延迟明显升高说明上游开始排队，此时保持并发不变
+            if self.latency_ewma > self.latency_baseline * self.latency_tolerance:
+                return
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def _on_congestion(self, retry_after):
+        self.congestion_events += 1
+        now = time.monotonic()
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if now - self.last_decrease >= self.decrease_cooldown:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            self.last_decrease = now
+
+    def stats(self):
+        """控制器状态"""
+        with self.condition:
+            return {
+                'limit': self.current_limit,
+                'in_flight': self.in_flight,
+                'successes': self.successes,
+                'congestion_events': self.congestion_events,
+                'latency_ewma': self.latency_ewma,
+                'latency_baseline': self.latency_baseline
+            }
+
+
+class TokenBucket:
+    """令牌桶（线程安全）
+
+    采用预约方式：每次取令牌立即扣减（允许为负），返回需要等待的秒数，
+    并发请求按到达顺序依次排队，不会同时醒来争抢。
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """预约令牌，返回需要等待的秒数"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= tokens
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """按主机划分的令牌桶限速器，同一实例可在所有线程和事件循环间共享"""
+
+    def __init__(self, host_limits=None, default_limit=None):
+        """
+        Args:
+            host_limits: {主机名: (每秒请求数, 突发容量) 或 None}，默认为 DEFAULT_HOST_LIMITS
+            default_limit: 未配置的主机使用的限速，None 表示不限速
+        """
+        self.host_limits = dict(DEFAULT_HOST_LIMITS if host_limits is None else host_limits)
+        self.default_limit = default_limit
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def set_limit(self, host, rate, burst=None):
+        """设置（或取消，rate=None）某个主机的限速"""
+        with self.lock:
+            self.host_limits[host] = (rate, burst) if rate else None
+            self.buckets.pop(host, None)
+
+    def get_bucket(self, url):
+        """获取URL对应主机的令牌桶，不限速时返回None"""
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            if host in self.buckets:
+                return self.buckets[host]
+            limit = self.host_limits.get(host, self.default_limit)
+            bucket = TokenBucket(*limit) if limit else None
+            self.buckets[host] = bucket
+            return bucket
+
+    def reserve(self, url):
+        """预约一次请求，返回需要等待的秒数"""
+        bucket = self.get_bucket(url)
+        return bucket.reserve() if bucket else 0.0
+
+    def acquire(self, url):
+        """阻塞直到允许向该主机发送请求"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, url):
+        """异步等待直到允许向该主机发送请求"""
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RetryBudget:
+    """全局重试预算（线程安全）
+
+    整个运行期间的重试次数不超过 请求数 * ratio + min_retries，
+    上游大面积故障时重试不会让请求量成倍增加。
+    """
+
+    def __init__(self, ratio=0.2, min_retries=10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def record_request(self):
+        """记录一次请求（含重试）"""
+        with self.lock:
+            self.requests += 1
+
+    def try_spend(self):
+        """尝试消耗一次重试额度，预算耗尽时返回False"""
+        with self.lock:
+            if self.retries < self.requests * self.ratio + self.min_retries:
+                self.retries += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def stats(self):
+        """预算使用情况"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'rejected': self.rejected
+            }
+
+
+class RetryPolicy:
+    """带抖动的指数退避重试策略"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=10.0, budget=None,
+                 retryable_categories=RETRYABLE_ERROR_CATEGORIES):
+        self.max_attempts = max(1, max_attempts)  # 每个链接的最大尝试次数（含首次）
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget if budget is not None else RetryBudget()
+        self.retryable_categories = retryable_categories
+
+    def record_attempt(self):
+        """记录一次请求尝试"""
+        self.budget.record_request()
+
+    def is_retryable(self, result):
+        """结果是否为可重试的临时性错误"""
+        return (isinstance(result, dict)
+                and result.get('status') == 'api_exception'
+                and result.get('error_category') in self.retryable_categories)
+
+    def should_retry(self, result, attempt):
+        """判断第 attempt 次尝试失败后是否重试（会消耗全局预算）"""
+        if attempt >= self.max_attempts or not self.is_retryable(result):
+            return False
+        return self.budget.try_spend()
+
+    def backoff(self, attempt, retry_after=None):
+        """第 attempt 次失败后的等待秒数（full jitter），服务端指定 Retry-After 时不少于该值"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """熔断器（线程安全）
+
+    - closed: 正常放行
+    - open: 连续失败达到阈值后熔断，冷却期内直接跳过
+    - half_open: 冷却期结束后放行一次探测请求，成功则恢复，失败则重新熔断
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started_at = 0.0
+
+    def allow_request(self):
+        """是否允许发出请求"""
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self.probe_in_flight = False
+            # 探测名额被占用但长时间没有结果（例如调用方最终没有发出请求）时重新放行
+            if self.state == self.HALF_OPEN and (
+                    not self.probe_in_flight or now - self.probe_started_at >= self.cooldown):
+                self.probe_in_flight = True
+                self.probe_started_at = now
+                return True
+            return False
+
+    def record_success(self):
+        """记录成功，恢复为closed"""
+        with self.lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """记录失败，达到阈值或探测失败时熔断"""
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+
+class EndpointSelector:
+    """备选接口选择器：跳过熔断中的接口，最近成功的接口排在最前"""
+
+    def __init__(self, endpoints, failure_threshold=3, cooldown=60.0):
+        self.endpoints = list(endpoints)
+        self.breakers = {
+            endpoint: CircuitBreaker(failure_threshold, cooldown) for endpoint in self.endpoints
+        }
+        self.lock = threading.Lock()
+        self.preferred = None
+        self.successes = {endpoint: 0 for endpoint in self.endpoints}
+        self.failures = {endpoint: 0 for endpoint in self.endpoints}
+
+    def candidates(self):
+        """按优先级返回全部接口（无副作用，不检查熔断状态）
+
+        调用方在实际请求每个接口之前再调用 allow()，
+        避免为最终没有尝试的接口占用半开状态的探测名额。
+        """
+        with self.lock:
+            preferred = self.preferred
+        if preferred in self.breakers:
+            return [preferred] + [endpoint for endpoint in self.endpoints if endpoint != preferred]
+        return list(self.endpoints)
+
+    def allow(self, endpoint):
+        """即将请求该接口时调用：熔断中返回False；半开状态下放行时占用探测名额"""
+        return self.breakers[endpoint].allow_request()
+
+    def record_success(self, endpoint):
+        """记录接口成功，并将其设为首选"""
+        self.breakers[endpoint].record_success()
+        with self.lock:
+            self.preferred = endpoint
+            self.successes[endpoint] += 1
+
+    def record_failure(self, endpoint):
+        """记录接口失败（网络异常、5xx、接口不存在等）"""
+        self.breakers[endpoint].record_failure()
+        with self.lock:
+            self.failures[endpoint] += 1
+            if self.preferred == endpoint:
+                self.preferred = None
+
+    def stats(self):
+        """各接口健康状态"""
+        with self.lock:
+            return {
+                endpoint: {
+                    'state': self.breakers[endpoint].state,
+                    'successes': self.successes[endpoint],
+                    'failures': self.failures[endpoint],
+                    'preferred': endpoint == self.preferred
+                }
+                for endpoint in self.endpoints
+            }
+
+
+class HedgePolicy:
+    """对冲请求策略（线程安全）
+
+    请求耗时超过近期延迟的 percentile 分位数仍未返回时，补发一个相同的请求，
+    取先返回的结果。补发比例不超过 max_hedge_ratio，避免放大上游负载。
+    """
+
+    def __init__(self, percentile=0.95, max_hedge_ratio=0.05, window=500, min_samples=20, min_delay=0.05):
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.min_delay = min_delay  # 对冲等待时间下限（秒）
+
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self._cached_delay = None
+        self._samples_since_update = 0
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record_latency(self, latency):
+        """记录一次请求耗时（秒）"""
+        with self.lock:
+            self.latencies.append(latency)
+            self._samples_since_update += 1
+            # 分位数每积累一定样本重新计算一次，避免每次请求都排序
+            if self._cached_delay is None or self._samples_since_update >= 25:
+                self._update_delay_locked()
+
+    def _update_delay_locked(self):
+        self._samples_since_update = 0
+        if len(self.latencies) < self.min_samples:
+            self._cached_delay = None
+            return
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile))
+        self._cached_delay = max(self.min_delay, ordered[index])
+
+    def hedge_delay(self):
+        """当前的对冲等待时间（秒），样本不足时返回None（不对冲）"""
+        with self.lock:
+            return self._cached_delay
+
+    def record_request(self):
+        """记录一次原始请求"""
+        with self.lock:
+            self.requests += 1
+
+    def try_hedge(self):
+        """申请补发一次对冲请求，超出比例上限时返回False"""
+        with self.lock:
+            if self.hedged + 1 > self.requests * self.max_hedge_ratio:
+                return False
+            self.hedged += 1
+            return True
+
+    def record_hedge_win(self):
+        """记录对冲请求先于原始请求返回"""
+        with self.lock:
+            self.hedge_wins += 1
+
+    def stats(self):
+        """对冲统计"""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'hedge_delay': self._cached_delay
+            }
+
+
+class _FlightCall:
+    """SingleFlight 中正在进行的一次调用"""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """合并同一键的并发调用（线程版）：同一时刻只执行一次，其余调用方等待并共享结果"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared_count = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行 fn(*args, **kwargs)，返回 (结果, 是否为共享结果)"""
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.shared_count += 1
+                leader = False
+            else:
+                call = _FlightCall()
+                self.calls[key] = call
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """合并同一键的并发调用（asyncio版），需在同一事件循环内使用"""
+
+    def __init__(self):
+        self.tasks = {}
+        self.shared_count = 0
+
+    async def do(self, key, coro_fn, *args, **kwargs):
+        """执行 await coro_fn(*args, **kwargs)，返回 (结果, 是否为共享结果)"""
+        task = self.tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.shared_count += 1
+        else:
+            task = asyncio.ensure_future(coro_fn(*args, **kwargs))
+            self.tasks[key] = task
+            task.add_done_callback(lambda _, key=key: self.tasks.pop(key, None))
+
+        # shield：某个调用方被取消时不影响共享同一任务的其他调用方
+        result = await asyncio.shield(task)
+        return result, shared
@@ -9,10 +9,8 @@
 
 import sys
 import os
-import json
 import time
 import requests
-import re
 from datetime import datetime, timezone, timedelta
 from urllib.parse import urlparse, parse_qs
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -29,6 +27,13 @@ from PyQt6.QtGui import QAction
 
 # 导入我们的分析器
 from optimal_gift_analyzer import OptimalGiftAnalyzer
+from redirect_cache import RedirectCache
+from result_cache import ResultCache
+from gift_result import GiftResult
+from result_store import ResultStore, ResultList
+import serializers
+from flow_control import AdaptiveConcurrencyController, HostRateLimiter, RetryPolicy, EndpointSelector, SingleFlight
+from page_scan import VIP_STATUS_MATCHER, VIP_PAGE_STOP_PATTERN, ExtractionStrategyCache, read_until
 
 # 北京时间转换函数
 def to_beijing_time(timestamp_ms):
@@ -82,10 +87,9 @@ class FileOperationThread(QThread):
     def _save_file(self):
         """保存文件"""
         try:
-            if self.kwargs.get('format') == 'json':
-                import json
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+            if self.kwargs.get('format') in ('json', 'msgpack'):
+                # 结果记录由序列化模块转换为dict（orjson/ujson/json，或 msgpack 二进制格式）
+                serializers.save_results(self.data, self.file_path, format=self.kwargs['format'])
             else:
                 # 文本格式
                 with open(self.file_path, 'w', encoding='utf-8') as f:
@@ -93,7 +97,7 @@ class FileOperationThread(QThread):
                         # 处理大量数据时显示进度
                         total = len(self.data)
                         for i, item in enumerate(self.data):
-                            if isinstance(item, dict):
+                            if isinstance(item, (dict, GiftResult)):
                                 f.write(item.get('short_url', str(item)) + '\n')
                             else:
                                 f.write(str(item) + '\n')
@@ -154,20 +158,51 @@ class FileOperationThread(QThread):
 
 class AnalyzerThread(QThread):
     """分析器工作线程"""
+
+    # VIP详情API备选地址（默认优先级顺序）
+    VIP_API_URLS = [
+        'https://interface.music.163.com/api/vipactivity/app/vip/invitation/detail/info/get',
+        'https://interface.music.163.com/api/vip/invitation/detail',
+        'https://music.163.com/api/vip/invitation/detail'
+    ]
     progress_updated = pyqtSignal(int, int, str)  # 当前进度, 总数, 状态信息
     result_ready = pyqtSignal(list)  # 分析结果（保留用于兼容性）
-    single_result_ready = pyqtSignal(dict)  # 单个分析结果（新增）
+    single_result_ready = pyqtSignal(object)  # 单个分析结果（GiftResult紧凑记录）
     error_occurred = pyqtSignal(str)  # 错误信息
 
-    def __init__(self, links, max_workers=5):
+    def __init__(self, links, max_workers=5, result_cache=None, adaptive_concurrency=False, rate_limiter=None,
+                 vip_endpoints=None, strategy_cache=None, redirect_cache=None, gift_cache=None):
         super().__init__()
         self.links = links
         self.max_workers = max_workers
-        self.analyzer = OptimalGiftAnalyzer()
+        # 自适应并发：以线程数为初始值，根据限流/超时/5xx自动升降
+        self.concurrency_controller = None
+        if adaptive_concurrency:
+            self.concurrency_controller = AdaptiveConcurrencyController(
+                initial_limit=max_workers, max_limit=max_workers * 4
+            )
+        # 短链接跳转目标固定不变，重定向结果持久化缓存，重复检查时跳过HEAD请求
+        # 通常由主界面持有并共享同一个连接；未传入时自行创建，分析结束后关闭
+        self.owns_redirect_cache = redirect_cache is None
+        self.redirect_cache = redirect_cache or RedirectCache()
+        # 结果缓存由主界面持有，多次分析之间共享（已过期/已领取完的礼品卡不再重复查询）
+        # 临时性错误自动重试，重试预算按本次分析的请求总量计算
+        self.analyzer = OptimalGiftAnalyzer(redirect_cache=self.redirect_cache, result_cache=result_cache,
+                                            rate_limiter=rate_limiter, retry_policy=RetryPolicy(),
+                                            gift_cache=gift_cache)
         self.is_running = True
         self.is_paused = False
         self.pause_event = threading.Event()
         self.pause_event.set()  # 初始状态为非暂停
+        self.stop_event = threading.Event()
+        # VIP详情API健康跟踪：持续失败的接口熔断一段时间，最近成功的接口优先尝试
+        self.vip_endpoints = vip_endpoints or EndpointSelector(self.VIP_API_URLS)
+        # 同一VIP邀请可能被多个短链接分享：按token合并有效期检查，本次分析内复用结果
+        self.vip_flight = SingleFlight()
+        self.vip_expiry_results = {}
+        self.vip_lock = threading.Lock()
+        # 按活动ID记住VIP页面模板上次命中的模式和位置（由主界面持有，多次分析之间共享）
+        self.strategy_cache = strategy_cache or ExtractionStrategyCache()
 
     def extract_token_info(self, vip_url):
         """从VIP URL中提取token和其他参数"""
@@ -196,17 +231,37 @@ class AnalyzerThread(QThread):
             print(f"[❌ URL解析失败] {e}")
             return None
 
+    @staticmethod
+    def summarize_vip_detail(detail_data):
+        """从VIP详情API响应中提取邀请者昵称、总天数和活动ID（缺少的字段不返回）"""
+        summary = {}
+        # 检查邀请者信息的不同字段名
+        inviter_info = detail_data.get('inviter', {})
+        if isinstance(inviter_info, dict) and 'nickname' in inviter_info:
+            summary['inviter_name'] = inviter_info['nickname']
+        elif 'inviterNickname' in detail_data:
+            summary['inviter_name'] = detail_data['inviterNickname']
+
+        # 检查总天数信息
+        if 'inviterTotalDays' in detail_data:
+            summary['total_days'] = detail_data['inviterTotalDays']
+        elif 'totalDays' in detail_data:
+            summary['total_days'] = detail_data['totalDays']
+
+        if 'activityId' in detail_data:
+            summary['activity_id'] = detail_data['activityId']
+        return summary
+
     def check_vip_api(self, token_info):
         """通过API检查VIP状态"""
         try:
-            # 尝试调用VIP详情API
-            api_urls = [
-                'https://interface.music.163.com/api/vipactivity/app/vip/invitation/detail/info/get',
-                'https://interface.music.163.com/api/vip/invitation/detail',
-                'https://music.163.com/api/vip/invitation/detail'
-            ]
-
-            for api_url in api_urls:
+            # 尝试调用VIP详情API（跳过熔断中的接口，最近成功的接口优先）
+            attempted = False
+            for api_url in self.vip_endpoints.candidates():
+                # 真正请求前才检查熔断，避免占用不会尝试的接口的探测名额
+                if not self.vip_endpoints.allow(api_url):
+                    continue
+                attempted = True
                 try:
                     params = {}
                     if token_info.get('token'):
@@ -215,11 +270,12 @@ class AnalyzerThread(QThread):
                         params['recordId'] = token_info['record_id']
 
                     print(f"[🔍 尝试API] {api_url}")
+                    self.analyzer.throttle(api_url)
                     response = requests.get(api_url, params=params, timeout=10)
 
                     if response.status_code == 200:
                         try:
-                            data = response.json()
+                            data = serializers.json_loads(response.content)
                             print(f"[✅ API响应成功] 状态码: {response.status_code}")
 
                             # 解析响应数据
@@ -238,35 +294,68 @@ class AnalyzerThread(QThread):
                                     remaining_days = (expire_time - current_time) / (1000 * 60 * 60 * 24)
 
                                     print(f"[⏰ 找到过期时间] {expire_time} -> {expire_date_beijing}")
+                                    self.vip_endpoints.record_success(api_url)
 
-                                    return {
+                                    api_result = {
                                         'is_valid': is_valid,
                                         'expire_time': expire_time,
                                         'expire_date': expire_date_beijing,
                                         'remaining_days': remaining_days,
-                                        'api_data': detail_data,
                                         'method': 'api',
                                         'error': None
                                     }
+                                    # 只保留需要的邀请信息，完整响应仅在开启 keep_api_response 时保存
+                                    api_result.update(self.summarize_vip_detail(detail_data))
+                                    if self.analyzer.keep_api_response:
+                                        api_result['api_data'] = detail_data
+                                    return api_result
                                 else:
                                     print(f"[⚠️ 未找到过期时间字段] 可用字段: {list(detail_data.keys())}")
 
-                        except json.JSONDecodeError:
+                        except serializers.JSONDecodeError:
                             print(f"[⚠️ JSON解析失败] {response.text[:200]}")
+                            self.vip_endpoints.record_failure(api_url)
                             continue
                     else:
                         print(f"[⚠️ API请求失败] 状态码: {response.status_code}")
+                        # 接口不存在或服务端错误计入熔断；其他状态码与具体token有关，不影响接口健康度
+                        if response.status_code == 404 or response.status_code >= 500:
+                            self.vip_endpoints.record_failure(api_url)
 
+                except requests.RequestException as e:
+                    print(f"[⚠️ API请求异常] {e}")
+                    self.vip_endpoints.record_failure(api_url)
+                    continue
                 except Exception as e:
                     print(f"[⚠️ API请求异常] {e}")
                     continue
 
+            if not attempted:
+                print("[⚠️ VIP详情API均处于熔断中] 直接使用页面解析")
             return None
 
         except Exception as e:
             print(f"[❌ API检查失败] {str(e)}")
             return None
 
+    def check_vip_expiry_deduped(self, redirect_url):
+        """按token检查VIP有效期，指向同一邀请的链接只检查一次"""
+        token_info = self.extract_token_info(redirect_url)
+        token = token_info.get('token') if token_info else None
+        if not token:
+            return self.check_vip_expiry(redirect_url)
+
+        with self.vip_lock:
+            known = self.vip_expiry_results.get(token)
+        if known is not None:
+            return dict(known)
+
+        result, _ = self.vip_flight.do(token, self.check_vip_expiry, redirect_url)
+        if not result.get('error'):
+            with self.vip_lock:
+                self.vip_expiry_results[token] = result
+        return dict(result)
+
     def check_vip_expiry(self, redirect_url):
         """检查VIP链接的有效期 - 增强版
 
@@ -295,73 +384,25 @@ class AnalyzerThread(QThread):
 
             # 2. API失败，回退到页面解析方法
             print(f"[🔍 API方法失败，尝试页面解析]")
-            response = requests.get(redirect_url, timeout=15)
-            response.raise_for_status()
-
-            content = response.text
-
-            # 多种模式匹配expireTime
-            expire_patterns = [
-                # JavaScript中的expireTime比较
-                r'expireTime["\']?\s*[)}\]]*\s*>=?\s*Date\.now\(\)',
-                # JSON格式的expireTime
-                r'["\']?expireTime["\']?\s*:\s*(\d{13})',
-                r'expireTime["\']?\s*=\s*(\d{13})',
-                # 对象属性访问
-                r'\.expireTime\s*>=?\s*Date\.now\(\)',
-                # 更宽泛的13位时间戳匹配
-                r'expire[^:]*:\s*(\d{13})',
-                r'time[^:]*:\s*(\d{13})',
-                # 新增模式
-                r'expireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
-                r'expire_time["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
-                r'"expireTime"\s*:\s*(\d{13})',
-                r"'expireTime'\s*:\s*(\d{13})",
-                r'tokenExpireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
-            ]
-
-            expire_time = None
-            matched_pattern = None
-
-            # 尝试不同的模式匹配
-            for i, pattern in enumerate(expire_patterns):
-                matches = re.findall(pattern, content, re.IGNORECASE)
-                if matches:
-                    print(f"[🔍 模式{i+1}匹配到] {matches}")
-                    for match in matches:
-                        if isinstance(match, str) and match.isdigit() and len(match) == 13:
-                            expire_time = int(match)
-                            matched_pattern = f"模式{i+1}"
-                            print(f"[✅ 找到时间戳] 使用{matched_pattern}: {expire_time}")
-                            break
-                    if expire_time:
-                        break
+            # 流式读取页面，找到最高优先级的过期时间字段后立即断开，否则读到字节上限
+            self.analyzer.throttle(redirect_url)
+            response = requests.get(redirect_url, timeout=15, stream=True)
+            try:
+                response.raise_for_status()
+            except requests.HTTPError:
+                response.close()
+                raise
 
-            # 如果没有找到明确的时间戳，尝试查找所有可能的13位数字
-            if not expire_time:
-                print("[🔍 尝试通用时间戳匹配]")
-                timestamp_pattern = r'\b(1[6-9]\d{11})\b'
-                timestamps = re.findall(timestamp_pattern, content)
-
-                if timestamps:
-                    print(f"[📋 找到所有时间戳] {timestamps}")
-                    current_time = int(time.time() * 1000)
-                    # 过滤出未来的时间戳
-                    future_timestamps = [int(ts) for ts in timestamps if int(ts) > current_time]
-
-                    if future_timestamps:
-                        expire_time = max(future_timestamps)
-                        matched_pattern = "通用匹配"
-                        print(f"[✅ 找到未来时间戳] {expire_time}")
-                    else:
-                        print(f"[⚠️ 找到时间戳但都是过去时间] {timestamps}")
-                        # 如果没有未来时间戳，取最大的时间戳
-                        if timestamps:
-                            expire_time = max(int(ts) for ts in timestamps)
-                            matched_pattern = "最大时间戳"
-                            print(f"[⚠️ 使用最大时间戳] {expire_time}")
-                else:
-                    print("[❌ 未找到任何13位时间戳]")
+            # 直接在原始字节上匹配，不解码页面（避免无charset时的编码探测）
+            content, _ = read_until(response, VIP_PAGE_STOP_PATTERN)
+
+            # 同一活动的页面先按上次命中的模式和位置匹配，未命中时完整扫描（按原有模式优先级）
+            activity_id = token_info.get('activity_id') if token_info else None
+            expire_time, matched_pattern = self.strategy_cache.extract(activity_id, content)
+            if expire_time:
+                print(f"[✅ 找到时间戳] 使用{matched_pattern}: {expire_time}")
+            else:
+                print("[❌ 未找到任何13位时间戳]")
 
             if expire_time:
                 # 检查是否过期
@@ -385,29 +426,18 @@ class AnalyzerThread(QThread):
                     'error': None
                 }
             else:
-                # 检查页面状态指示器
-                status_indicators = {
-                    '已过期': 'expired',
-                    '活动已结束': 'ended',
-                    '邀请已失效': 'invalid',
-                    '链接已失效': 'invalid',
-                    '不存在': 'not_found',
-                    '已领取': 'claimed',
-                    '领取成功': 'claimed',
-                    '活动火爆': 'busy',
-                    '请稍后重试': 'retry',
-                }
-
-                for indicator, status in status_indicators.items():
-                    if indicator in content:
-                        return {
-                            'is_valid': False,
-                            'expire_time': None,
-                            'expire_date': None,
-                            'remaining_days': 0,
-                            'method': 'page',
-                            'error': f'页面状态: {status} ({indicator})'
-                        }
+                # 检查页面状态指示器（一次扫描找出全部提示，按原有顺序取第一个）
+                found = VIP_STATUS_MATCHER.first(content)
+                if found:
+                    indicator, status = found
+                    return {
+                        'is_valid': False,
+                        'expire_time': None,
+                        'expire_date': None,
+                        'remaining_days': 0,
+                        'method': 'page',
+                        'error': f'页面状态: {status} ({indicator})'
+                    }
 
                 return {
                     'is_valid': False,
@@ -440,20 +470,31 @@ class AnalyzerThread(QThread):
     def analyze_single_link(self, link):
         """分析单个链接，包含增强VIP有效期检查"""
         try:
+            # 礼品卡结果缓存命中时无需任何网络请求
+            cached = self.analyzer.lookup_cached_result(link)
+            if cached is not None:
+                cached['is_vip_link'] = False
+                return cached
+
             # 首先检查是否为VIP链接（通过重定向检查）
             is_vip_link = False
             redirect_url = None
 
+            # 只解析一次重定向，结果同时用于VIP判断和礼品卡分析
+            resolution = self.analyzer.resolve_short_link(link)
+
             try:
-                # 获取重定向URL
-                response = requests.head(link, allow_redirects=False, timeout=5)
-                if response.status_code in [301, 302] and 'Location' in response.headers:
-                    redirect_url = response.headers['Location']
+                if resolution.error:
+                    raise resolution.error
+                if resolution.status_code in [301, 302] and resolution.location:
+                    redirect_url = resolution.location
                     is_vip_link = 'vip-invite-cashier' in redirect_url
                 else:
-                    # 如果HEAD失败，尝试GET
-                    response = requests.get(link, allow_redirects=True, timeout=10)
+                    # 如果HEAD失败，尝试GET（只需要最终URL，读取响应头后即关闭，不下载页面）
+                    self.analyzer.throttle(link)
+                    response = requests.get(link, allow_redirects=True, timeout=10, stream=True)
                     redirect_url = response.url
+                    response.close()
                     is_vip_link = 'vip-invite-cashier' in redirect_url
             except:
                 pass
@@ -463,7 +504,7 @@ class AnalyzerThread(QThread):
                 print(f"[🎯 检测到VIP链接] {link}")
 
                 # 进行VIP有效期检查
-                expiry_result = self.check_vip_expiry(redirect_url)
+                expiry_result = self.check_vip_expiry_deduped(redirect_url)
 
                 # 构建VIP链接结果 - 只显示VIP相关信息
                 result = {
@@ -505,33 +546,25 @@ class AnalyzerThread(QThread):
                     result['expire_date'] = expire_date  # 修正字段名
 
                     # 如果是API方法获取的，添加邀请者信息
-                    if method == 'api' and expiry_result.get('api_data'):
-                        api_data = expiry_result['api_data']
-                        # 检查邀请者信息的不同字段名
-                        inviter_info = api_data.get('inviter', {})
-                        if isinstance(inviter_info, dict) and 'nickname' in inviter_info:
-                            result['sender'] = inviter_info['nickname']
-                        elif 'inviterNickname' in api_data:
-                            result['sender'] = api_data['inviterNickname']
-
-                        # 检查总天数信息
-                        if 'inviterTotalDays' in api_data:
-                            total_days = api_data['inviterTotalDays']
+                    if method == 'api':
+                        if 'inviter_name' in expiry_result:
+                            result['sender'] = expiry_result['inviter_name']
+
+                        # 总天数信息
+                        if 'total_days' in expiry_result:
+                            total_days = expiry_result['total_days']
                             result['gift_type'] = f"VIP邀请 ({total_days}天)"
                             result['gift_count'] = f"{total_days}天"
-                        elif 'totalDays' in api_data:
-                            result['gift_type'] = f"VIP邀请 ({api_data['totalDays']}天)"
-                            result['gift_count'] = f"{api_data['totalDays']}天"
 
                         # 添加活动ID信息
-                        if 'activityId' in api_data:
-                            result['activity_id'] = api_data['activityId']
+                        if 'activity_id' in expiry_result:
+                            result['activity_id'] = expiry_result['activity_id']
 
                 return result
 
             # 如果不是VIP链接，进行常规礼品卡分析
             else:
-                result = self.analyzer.analyze_gift_link(link)
+                result = self.analyzer.analyze_gift_link(link, resolution=resolution, check_cache=False)
 
                 # 标记为非VIP链接
                 result['is_vip_link'] = False
@@ -578,7 +611,20 @@ class AnalyzerThread(QThread):
                     return None
 
                 # 使用增强的分析方法，包含VIP有效期检查
-                result = self.analyze_single_link(link)
+                if self.concurrency_controller:
+                    if not self.concurrency_controller.acquire(self.stop_event):
+                        return None
+                    result = None
+                    start = time.monotonic()
+                    try:
+                        result = self.analyze_single_link(link)
+                    finally:
+                        self.concurrency_controller.release(result, time.monotonic() - start)
+                else:
+                    result = self.analyze_single_link(link)
+
+                # 整个会话都会保留结果，转换为紧凑记录以节省内存
+                result = GiftResult.from_dict(result)
 
                 # 发送单个结果（实时显示）
                 self.single_result_ready.emit(result)
@@ -609,8 +655,9 @@ class AnalyzerThread(QThread):
 
                 return result
 
-            # 使用ThreadPoolExecutor进行多线程处理
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # 使用ThreadPoolExecutor进行多线程处理（自适应模式下线程池取并发上限）
+            pool_size = self.concurrency_controller.max_limit if self.concurrency_controller else self.max_workers
+            with ThreadPoolExecutor(max_workers=pool_size) as executor:
                 # 提交所有任务
                 future_to_link = {executor.submit(process_link_with_callback, link): link
                                  for link in self.links}
@@ -629,20 +676,32 @@ class AnalyzerThread(QThread):
                             results.append(result)
                     except Exception as e:
                         link = future_to_link[future]
-                        error_result = {
-                            'status': 'error',
-                            'message': f'处理失败: {str(e)}',
-                            'short_url': link,
-                            'is_vip_link': False
-                        }
+                        error_result = GiftResult(
+                            status='error',
+                            message=f'处理失败: {str(e)}',
+                            short_url=link,
+                            is_vip_link=False
+                        )
                         results.append(error_result)
                         self.single_result_ready.emit(error_result)
 
+            stats = self.redirect_cache.stats()
+            print(f"[🗃️ 重定向缓存] 命中 {stats['hits']} | 未命中 {stats['misses']} | 命中率 {stats['hit_rate']*100:.1f}%")
+            stats = self.strategy_cache.stats()
+            if stats['hits'] or stats['misses']:
+                print(f"[🧩 页面模板策略] 命中 {stats['hits']} | 未命中 {stats['misses']} | "
+                      f"命中率 {stats['hit_rate']*100:.1f}% | 活动数 {stats['activities']}")
+
             if self.is_running:
                 self.result_ready.emit(results)
 
         except Exception as e:
             self.error_occurred.emit(str(e))
+        finally:
+            if self.owns_redirect_cache:
+                self.redirect_cache.close()
+            else:
+                self.redirect_cache.flush()
 
     def pause(self):
         """暂停分析"""
@@ -657,6 +716,7 @@ class AnalyzerThread(QThread):
     def stop(self):
         """停止分析"""
         self.is_running = False
+        self.stop_event.set()
         self.pause_event.set()  # 确保线程不会卡在暂停状态
 
 class FileOperationThread(QThread):
@@ -699,10 +759,9 @@ class FileOperationThread(QThread):
     def _save_file(self):
         """保存文件"""
         try:
-            if self.kwargs.get('format') == 'json':
-                import json
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    json.dump(self.data, f, indent=2, ensure_ascii=False)
+            if self.kwargs.get('format') in ('json', 'msgpack'):
+                # 结果记录由序列化模块转换为dict（orjson/ujson/json，或 msgpack 二进制格式）
+                serializers.save_results(self.data, self.file_path, format=self.kwargs['format'])
             else:
                 # 文本格式
                 with open(self.file_path, 'w', encoding='utf-8') as f:
@@ -710,7 +769,7 @@ class FileOperationThread(QThread):
                         # 处理大量数据时显示进度
                         total = len(self.data)
                         for i, item in enumerate(self.data):
-                            if isinstance(item, dict):
+                            if isinstance(item, (dict, GiftResult)):
                                 f.write(item.get('short_url', str(item)) + '\n')
                             else:
                                 f.write(str(item) + '\n')
@@ -779,8 +838,23 @@ class GiftAnalyzerUI(QMainWindow):
         super().__init__()
         # 礼品卡分析器相关
         self.analyzer_thread = None
+        # 与 current_results 同步的列式存储，用于统计和按状态划分链接
+        self.result_store = ResultStore()
+        self.result_store_version = None
         self.current_results = []
         self.is_analysis_paused = False  # 分析暂停状态
+        # 礼品卡结果缓存，在多次分析之间共享
+        self.result_cache = ResultCache()
+        # 按礼品卡身份缓存的结果，别名短链接直接复用（与按短链接的结果缓存分开）
+        self.gift_cache = ResultCache()
+        # 重定向持久化缓存，所有分析线程共享同一个数据库连接，退出时关闭
+        self.redirect_cache = RedirectCache()
+        # 按主机限速器，所有分析线程共享
+        self.rate_limiter = HostRateLimiter()
+        # VIP详情API健康状态，在多次分析之间保留
+        self.vip_endpoints = EndpointSelector(AnalyzerThread.VIP_API_URLS)
+        # VIP页面提取策略（按活动ID），在多次分析之间保留
+        self.strategy_cache = ExtractionStrategyCache()
 
         # 文件操作线程
         self.file_operation_thread = None
@@ -840,6 +914,8 @@ class GiftAnalyzerUI(QMainWindow):
         self.thread_spinbox = QSpinBox()
         self.thread_spinbox.setRange(1, 20)
         self.thread_spinbox.setValue(5)
+        self.adaptive_concurrency_cb = QCheckBox("自适应并发")
+        self.adaptive_concurrency_cb.setToolTip("以线程数为初始并发，遇到限流/超时/服务器错误自动降低，正常时逐步提高（最多4倍）")
 
         toolbar_layout.addWidget(self.load_btn)
         toolbar_layout.addWidget(self.analyze_btn)
@@ -848,6 +924,7 @@ class GiftAnalyzerUI(QMainWindow):
         toolbar_layout.addStretch()
         toolbar_layout.addWidget(thread_label)
         toolbar_layout.addWidget(self.thread_spinbox)
+        toolbar_layout.addWidget(self.adaptive_concurrency_cb)
         toolbar_layout.addWidget(self.save_btn)
         toolbar_layout.addWidget(self.clear_btn)
 
@@ -1187,7 +1264,13 @@ class GiftAnalyzerUI(QMainWindow):
         self.progress_bar.setValue(0)
 
         # 启动分析线程
-        self.analyzer_thread = AnalyzerThread(links, max_workers)
+        self.analyzer_thread = AnalyzerThread(links, max_workers, result_cache=self.result_cache,
+                                              gift_cache=self.gift_cache,
+                                              adaptive_concurrency=self.adaptive_concurrency_cb.isChecked(),
+                                              rate_limiter=self.rate_limiter,
+                                              vip_endpoints=self.vip_endpoints,
+                                              strategy_cache=self.strategy_cache,
+                                              redirect_cache=self.redirect_cache)
         self.analyzer_thread.progress_updated.connect(self.update_progress)
         self.analyzer_thread.result_ready.connect(self.analysis_completed)
         self.analyzer_thread.single_result_ready.connect(self.add_single_result)
@@ -1270,7 +1353,13 @@ class GiftAnalyzerUI(QMainWindow):
 
         # 启动分析线程
         max_workers = self.thread_spinbox.value()
-        self.analyzer_thread = AnalyzerThread(links, max_workers)
+        self.analyzer_thread = AnalyzerThread(links, max_workers, result_cache=self.result_cache,
+                                              gift_cache=self.gift_cache,
+                                              adaptive_concurrency=self.adaptive_concurrency_cb.isChecked(),
+                                              rate_limiter=self.rate_limiter,
+                                              vip_endpoints=self.vip_endpoints,
+                                              strategy_cache=self.strategy_cache,
+                                              redirect_cache=self.redirect_cache)
         self.analyzer_thread.progress_updated.connect(self.update_progress)
         self.analyzer_thread.result_ready.connect(self.analysis_completed)
         self.analyzer_thread.single_result_ready.connect(self.add_single_result)  # 新增实时结果连接
@@ -1801,16 +1890,43 @@ class GiftAnalyzerUI(QMainWindow):
             if self.should_show_result(result):
                 self.add_result_to_table(result)
 
+    @property
+    def current_results(self):
+        """当前分析结果（ResultList）"""
+        return self._current_results
+
+    @current_results.setter
+    def current_results(self, results):
+        # 整体替换结果时包装为 ResultList，列式存储在下次使用时重建
+        self._current_results = ResultList(results)
+        self.result_store_version = None
+
+    def get_result_store(self):
+        """返回与 current_results 同步的列式存储
+
+        追加的结果增量编码；结果被整体替换或已有行被修改（版本变化）时重新构建。
+        """
+        results = self.current_results
+        store = self.result_store
+        if self.result_store_version != results.version or len(store) > len(results):
+            store.clear()
+            self.result_store_version = results.version
+        if len(store) < len(results):
+            store.extend(results[len(store):])
+        return store
+
     def update_statistics(self):
         """更新统计信息"""
         if not self.current_results:
             return
 
-        total = len(self.current_results)
-        success_count = len([r for r in self.current_results if r['status'] == 'success'])
-        api_exception_count = len([r for r in self.current_results if r['status'] == 'api_exception'])
-        system_exception_count = len([r for r in self.current_results if r['status'] == 'system_exception'])
-        invalid_count = len([r for r in self.current_results if r['status'] in ['invalid', 'error']])
+        store = self.get_result_store()
+        status_counts = store.value_counts('status')
+        total = len(store)
+        success_count = status_counts.get('success', 0)
+        api_exception_count = status_counts.get('api_exception', 0)
+        system_exception_count = status_counts.get('system_exception', 0)
+        invalid_count = status_counts.get('invalid', 0) + status_counts.get('error', 0)
 
         stats_text = f"📊 分析统计\n"
         stats_text += f"总链接数: {total}\n"
@@ -1820,36 +1936,15 @@ class GiftAnalyzerUI(QMainWindow):
         stats_text += f"无效链接: {invalid_count}\n\n"
 
         if success_count > 0:
-            # 状态统计
-            status_count = {}
-            gift_types = {}
-            vip_status_count = {}
-            total_value = 0
-            available_value = 0
-            vip_count = 0
-            non_vip_count = 0
-
-            for result in self.current_results:
-                if result['status'] == 'success':
-                    status = result.get('gift_status', 'unknown')
-                    status_count[status] = status_count.get(status, 0) + 1
-
-                    gift_type = result.get('gift_type', 'Unknown')
-                    gift_types[gift_type] = gift_types.get(gift_type, 0) + 1
-
-                    price = result.get('gift_price', 0)
-                    total_value += price
-                    if status == 'available':
-                        available_value += price
-
-                    # VIP状态统计
-                    is_vip_link = result.get('is_vip_link', False)
-                    if is_vip_link:
-                        vip_count += 1
-                        vip_status = result.get('vip_status', 'unknown')
-                        vip_status_count[vip_status] = vip_status_count.get(vip_status, 0) + 1
-                    else:
-                        non_vip_count += 1
+            success = store.where('status', 'success')
+            vip = success & store.where('is_vip_link', True)
+            status_count = store.value_counts('gift_status', success)
+            gift_types = store.value_counts('gift_type', success)
+            total_value = store.sum('gift_price', success)
+            available_value = store.sum('gift_price', success & store.where('gift_status', 'available'))
+            vip_count = store.count(vip)
+            non_vip_count = success_count - vip_count
+            vip_status_count = store.value_counts('vip_status', vip)
 
             stats_text += "🎁 状态分布:\n"
             for status, count in status_count.items():
@@ -1890,11 +1985,7 @@ class GiftAnalyzerUI(QMainWindow):
                         stats_text += f"  {status_name}: {count} ({percentage:.1f}%)\n"
 
                     # 检测方法统计
-                    method_count = {}
-                    for result in self.current_results:
-                        if result.get('is_vip_link', False) and result['status'] == 'success':
-                            method = result.get('vip_expiry_check', {}).get('method', 'unknown')
-                            method_count[method] = method_count.get(method, 0) + 1
+                    method_count = store.value_counts('vip_method', vip)
 
                     if method_count:
                         stats_text += f"\n🛠️ VIP检测方法:\n"
@@ -1909,11 +2000,7 @@ class GiftAnalyzerUI(QMainWindow):
 
         # API异常详细统计
         if api_exception_count > 0:
-            api_exception_categories = {}
-            for result in self.current_results:
-                if result['status'] == 'api_exception':
-                    category = result.get('error_category', 'unknown')
-                    api_exception_categories[category] = api_exception_categories.get(category, 0) + 1
+            api_exception_categories = store.value_counts('error_category', store.where('status', 'api_exception'))
 
             stats_text += f"\n⚠️ API异常分类:\n"
             category_names = {
@@ -1941,39 +2028,20 @@ class GiftAnalyzerUI(QMainWindow):
             return
 
         # 详细统计各种状态的链接
-        valid_results = []
-        valid_links = []
-        expired_links = []
-        claimed_links = []
-        api_exception_links = []
-        error_links = []
-
-        for result in self.current_results:
-            status = result.get('status', 'unknown')
-            short_url = result.get('short_url', '')
-
-            if status == 'success':
-                gift_status = result.get('gift_status', 'unknown')
-
-                if gift_status == 'available':
-                    # 可领取的链接 - 保留
-                    valid_results.append(result)
-                    valid_links.append(short_url)
-                elif gift_status == 'expired':
-                    # 已过期的链接 - 删除
-                    expired_links.append(short_url)
-                elif gift_status == 'claimed':
-                    # 已领取的链接 - 删除
-                    claimed_links.append(short_url)
-                else:
-                    # 其他状态 - 删除
-                    error_links.append(short_url)
-            elif status == 'api_exception':
-                # API异常的链接 - 删除
-                api_exception_links.append(short_url)
-            else:
-                # 其他分析失败的链接 - 删除
-                error_links.append(short_url)
+        store = self.get_result_store()
+        success = store.where('status', 'success')
+        available = success & store.where('gift_status', 'available')
+        expired = success & store.where('gift_status', 'expired')
+        claimed = success & store.where('gift_status', 'claimed')
+        api_exception = store.where('status', 'api_exception')
+
+        # 可领取的链接保留；已过期、已领取、API异常及其他分析失败的链接删除
+        valid_results = store.take(available)
+        valid_links = store.select('short_url', available)
+        expired_links = store.select('short_url', expired)
+        claimed_links = store.select('short_url', claimed)
+        api_exception_links = store.select('short_url', api_exception)
+        error_links = store.select('short_url', store.negate(available | expired | claimed | api_exception))
 
         total_invalid = len(expired_links) + len(claimed_links) + len(api_exception_links) + len(error_links)
 
@@ -2374,9 +2442,11 @@ class GiftAnalyzerUI(QMainWindow):
             QMessageBox.warning(self, "警告", "没有结果可以保存！")
             return
 
+        file_filter = "JSON文件 (*.json);;所有文件 (*)"
+        if serializers.MSGPACK_AVAILABLE:
+            file_filter = "JSON文件 (*.json);;MessagePack文件 (*.msgpack);;所有文件 (*)"
         file_path, _ = QFileDialog.getSaveFileName(
-            self, "保存分析结果", "gift_analysis_results.json",
-            "JSON文件 (*.json);;所有文件 (*)"
+            self, "保存分析结果", "gift_analysis_results.json", file_filter
         )
 
         if file_path:
@@ -2386,7 +2456,8 @@ class GiftAnalyzerUI(QMainWindow):
                 return
 
             # 启动文件保存线程
-            self.file_operation_thread = FileOperationThread('save', file_path, self.current_results, format='json')
+            self.file_operation_thread = FileOperationThread('save', file_path, self.current_results,
+                                                             format=serializers.detect_format(file_path))
             self.file_operation_thread.operation_completed.connect(self.on_file_save_completed)
             self.file_operation_thread.progress_updated.connect(self.on_file_progress_updated)
             self.file_operation_thread.start()
@@ -2523,10 +2594,12 @@ class GiftAnalyzerUI(QMainWindow):
                     self.analyzer_thread.wait()
                 if file_operation_running:
                     self.file_operation_thread.wait()  # 文件操作线程没有stop方法，直接等待完成
+                self.redirect_cache.close()
                 event.accept()
             else:
                 event.ignore()
         else:
+            self.redirect_cache.close()
             event.accept()
 
 def main():
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的分析结果记录
+桌面端整个会话都会保留全部结果，几十万条链接时普通dict占用内存过多：
+常用字段存放在 __slots__ 中，重复出现的字符串（礼品类型、发送者、状态文本等）驻留共享，
+其他少见字段放在附加字典里。记录支持dict的常用操作，导出时用 to_dict() 转回普通dict。
+"""
+
+import sys
+from collections.abc import MutableMapping
+from operator import attrgetter
+
+# 常用字段，存放在 __slots__ 中
+RESULT_FIELDS = (
+    'status', 'gift_status', 'status_text', 'short_url', 'redirect_url', 'message',
+    'error_type', 'error_category', 'error_message', 'technical_details',
+    'sender_id', 'sender_name', 'gift_data', 'gift_type', 'gift_price',
+    'total_count', 'used_count', 'available_count', 'expire_time', 'expire_date', 'is_expired',
+    'is_vip_link', 'from_cache', 'retry_count', 'retry_backoff',
+    # VIP链接
+    'vip_status', 'vip_status_text', 'vip_expiry_check', 'sender', 'gift_count', 'activity_id',
+)
+
+# 取值大量重复的字段，字符串驻留后所有记录共享同一对象
+INTERNED_FIELDS = frozenset((
+    'status', 'gift_status', 'status_text', 'error_type', 'error_category', 'sender_name', 'gift_type',
+    'vip_status', 'sender', 'gift_count',
+))
+
+_FIELD_SET = frozenset(RESULT_FIELDS)
+_MISSING = object()  # 未设置的字段统一取此值，避免读取空槽位时抛出 AttributeError
+_get_fields = attrgetter(*RESULT_FIELDS)
+
+
+class GiftResult(MutableMapping):
+    """紧凑的分析结果记录，可像dict一样读写"""
+
+    __slots__ = RESULT_FIELDS + ('_extra',)
+
+    def __init__(self, data=None, **kwargs):
+        for key in RESULT_FIELDS:
+            setattr(self, key, _MISSING)
+        self._extra = None  # 不在常用字段中的其他字段
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由dict（或另一条记录）创建记录"""
+        if isinstance(data, cls):
+            return data.copy()
+        return cls(data)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            if key in INTERNED_FIELDS and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key, value in zip(RESULT_FIELDS, _get_fields(self)):
+            if value is not _MISSING:
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        count = sum(1 for value in _get_fields(self) if value is not _MISSING)
+        return count + (len(self._extra) if self._extra is not None else 0)
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def copy(self):
+        """浅拷贝，返回新的记录"""
+        duplicate = GiftResult.__new__(GiftResult)
+        for key, value in zip(RESULT_FIELDS, _get_fields(self)):
+            setattr(duplicate, key, value)
+        duplicate._extra = dict(self._extra) if self._extra is not None else None
+        return duplicate
+
+    def to_dict(self):
+        """转换为普通dict（用于JSON序列化和导出）"""
+        data = {key: value for key, value in zip(RESULT_FIELDS, _get_fields(self)) if value is not _MISSING}
+        if self._extra is not None:
+            data.update(self._extra)
+        return data
+
+    def __repr__(self):
+        return f"GiftResult({self.to_dict()!r})"
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+短链接重定向解析结果
+一次HEAD请求的结果在链接分类、礼品卡分析、VIP检测之间传递，避免重复解析
+"""
+
+from urllib.parse import urlsplit
+
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+
+
+def normalize_short_url(url):
+    """规范化短链接，用作去重键
+
+    忽略首尾空白、协议(http/https)、主机名大小写和末尾斜杠；
+    路径区分大小写（短链接编码本身区分大小写）。
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    key = (parts.hostname or '').lower() + parts.path.rstrip('/')
+    if parts.query:
+        key += '?' + parts.query
+    return key
+
+
+class LinkResolution:
+    """短链接重定向解析结果"""
+
+    __slots__ = ('short_url', 'status_code', 'location', 'error')
+
+    def __init__(self, short_url, status_code=None, location=None, error=None):
+        self.short_url = short_url
+        self.status_code = status_code  # HEAD响应状态码，请求异常时为None
+        self.location = location  # Location响应头
+        self.error = error  # 请求异常（如有）
+
+    @property
+    def redirect_url(self):
+        """重定向目标URL，未发生重定向时为None"""
+        if self.status_code in REDIRECT_STATUS_CODES and self.location:
+            return self.location
+        return None
+
+    @property
+    def is_gift(self):
+        """是否为礼品卡链接"""
+        return 'gift-receive' in (self.redirect_url or '')
+
+    @property
+    def is_vip(self):
+        """是否为VIP邀请链接"""
+        return 'vip-invite-cashier' in (self.redirect_url or '')
+
+    def __repr__(self):
+        return (f"LinkResolution(short_url={self.short_url!r}, status_code={self.status_code!r}, "
+                f"location={self.location!r}, error={self.error!r})")
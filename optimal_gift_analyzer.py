@@ -13,16 +13,108 @@ from Crypto.Util.Padding import pad
 from urllib.parse import urlparse, parse_qs
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from requests.exceptions import (
     RequestException, ConnectionError, Timeout,
     HTTPError, TooManyRedirects, SSLError
 )
+from link_resolution import LinkResolution, normalize_short_url
+from flow_control import parse_retry_after, SingleFlight
+from result_store import ResultStore
+import serializers
+from serializers import json_loads, JSONDecodeError
+
+class EncSecKeyPool:
+    """预加密会话密钥池
+
+    encSecKey 只依赖随机密钥本身，因此可以提前生成 (random_str, encSecKey)
+    密钥对并在请求间复用，每次请求只需两次AES加密。
+    """
+
+    def __init__(self, encryption, size=32, refresh_interval=None):
+        self.encryption = encryption
+        self.size = max(1, size)
+        self.refresh_interval = refresh_interval
+
+        self.lock = threading.Lock()
+        self.pairs = []
+        self._next_slot = 0
+        self._stop_event = threading.Event()
+        self._refresh_thread = None
+
+        self.fill()
+        if refresh_interval:
+            self.start_refresh()
+
+    def create_pair(self):
+        """生成一个 (随机字符串, encSecKey) 密钥对"""
+        random_str = self.encryption.create_random_string(16)
+        enc_sec_key = self.encryption.rsa_encrypt(
+            random_str, self.encryption.public_key, self.encryption.modulus
+        )
+        return random_str, enc_sec_key
+
+    def fill(self):
+        """将密钥池填满"""
+        while True:
+            with self.lock:
+                if len(self.pairs) >= self.size:
+                    return
+            # RSA运算放在锁外，避免阻塞取用密钥的线程
+            pair = self.create_pair()
+            with self.lock:
+                if len(self.pairs) < self.size:
+                    self.pairs.append(pair)
+
+    def get(self):
+        """取出一个密钥对（轮询复用）"""
+        with self.lock:
+            if self.pairs:
+                pair = self.pairs[self._next_slot % len(self.pairs)]
+                self._next_slot += 1
+                return pair
+        # 池为空时退化为即时生成
+        return self.create_pair()
+
+    def refresh_one(self):
+        """替换池中最旧的一个密钥对"""
+        pair = self.create_pair()
+        with self.lock:
+            if len(self.pairs) < self.size:
+                self.pairs.append(pair)
+            else:
+                self.pairs.pop(0)
+                self.pairs.append(pair)
+
+    def start_refresh(self):
+        """启动后台刷新线程，每隔 refresh_interval 秒替换一个密钥对"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, name='EncSecKeyPoolRefresh', daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_refresh(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        if self._refresh_thread:
+            self._refresh_thread.join(timeout=1)
+            self._refresh_thread = None
+
+    def _refresh_loop(self):
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh_one()
+            except Exception as e:
+                print(f"[⚠️ 密钥池刷新失败] {e}")
 
 class NetEaseEncryption:
     """网易云音乐加密工具类"""
     
-    def __init__(self):
+    def __init__(self, key_pool_size=0, key_refresh_interval=None, first_stage_cache_size=4096):
         self.character = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
         self.iv = '0102030405060708'
         self.public_key = '010001'
@@ -33,6 +125,21 @@ class NetEaseEncryption:
                        '424d813cfe4875d3e82047b97ddef52741d546b8e289dc69' \
                        '35b3ece0462db0a22b8e7'
         self.nonce = '0CoJUm6Qyw8W8jud'
+
+        # 常量密钥材料只编码一次
+        self._iv_bytes = self.iv.encode()
+        self._nonce_bytes = self.nonce.encode()
+
+        # 第一次AES加密只依赖明文（nonce固定），相同payload可直接复用结果
+        if first_stage_cache_size > 0:
+            self.first_stage_encrypt = lru_cache(maxsize=first_stage_cache_size)(self._first_stage_encrypt)
+        else:
+            self.first_stage_encrypt = self._first_stage_encrypt
+
+        # 密钥池模式：key_pool_size > 0 时复用预先计算好的 encSecKey
+        self.key_pool = None
+        if key_pool_size > 0:
+            self.key_pool = EncSecKeyPool(self, key_pool_size, key_refresh_interval)
     
     def create_random_string(self, length=16):
         """生成随机字符串"""
@@ -40,12 +147,27 @@ class NetEaseEncryption:
     
     def aes_encrypt(self, text, key):
         """AES加密"""
-        text = pad(text.encode(), AES.block_size)
-        key = key.encode()
-        iv = self.iv.encode()
-        cipher = AES.new(key, AES.MODE_CBC, iv)
-        encrypted = cipher.encrypt(text)
+        return self._aes_encrypt_bytes(text.encode(), key.encode())
+
+    def _aes_encrypt_bytes(self, data, key):
+        """AES加密（输入已编码的明文和密钥）"""
+        # CBC模式的cipher对象带有链式状态，每条消息需新建
+        cipher = AES.new(key, AES.MODE_CBC, self._iv_bytes)
+        encrypted = cipher.encrypt(pad(data, AES.block_size))
         return base64.b64encode(encrypted).decode()
+
+    def _first_stage_encrypt(self, data):
+        """以nonce为密钥的第一次AES加密"""
+        return self._aes_encrypt_bytes(data.encode(), self._nonce_bytes)
+
+    def _get_key_pair(self):
+        """获取 (随机字符串, encSecKey) 密钥对"""
+        if self.key_pool:
+            # 从密钥池取出随机字符串及其预先计算的RSA结果
+            return self.key_pool.get()
+        # 生成16位随机字符串并RSA加密
+        random_str = self.create_random_string(16)
+        return random_str, self.rsa_encrypt(random_str, self.public_key, self.modulus)
     
     def rsa_encrypt(self, text, e, n):
         """RSA加密"""
@@ -57,27 +179,45 @@ class NetEaseEncryption:
     
     def encrypt_params(self, data):
         """加密参数"""
-        # 生成16位随机字符串
-        random_str = self.create_random_string(16)
+        random_str, rsa_encrypted = self._get_key_pair()
         
         # 第一次AES加密
-        first_encrypt = self.aes_encrypt(data, self.nonce)
+        first_encrypt = self.first_stage_encrypt(data)
         
         # 第二次AES加密
         second_encrypt = self.aes_encrypt(first_encrypt, random_str)
         
-        # RSA加密随机字符串
-        rsa_encrypted = self.rsa_encrypt(random_str, self.public_key, self.modulus)
-        
         return {
             'params': second_encrypt,
             'encSecKey': rsa_encrypted
         }
 
+    def encrypt_params_many(self, payloads):
+        """批量加密参数
+
+        整批共用一个密钥对，payload 可以是JSON字符串或dict。
+        返回与输入顺序一致的加密参数列表。
+        """
+        random_str, rsa_encrypted = self._get_key_pair()
+        key = random_str.encode()
+
+        encrypted_list = []
+        for payload in payloads:
+            if not isinstance(payload, str):
+                payload = json.dumps(payload)
+            first_encrypt = self.first_stage_encrypt(payload)
+            encrypted_list.append({
+                'params': self._aes_encrypt_bytes(first_encrypt.encode(), key),
+                'encSecKey': rsa_encrypted
+            })
+        return encrypted_list
+
 class OptimalGiftAnalyzer:
     """最优礼品卡分析器 - 直接调用API"""
 
-    def __init__(self):
+    def __init__(self, key_pool_size=0, key_refresh_interval=None, redirect_cache=None, result_cache=None,
+                 rate_limiter=None, retry_policy=None, hedge_policy=None, keep_api_response=False,
+                 gift_cache=None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -86,9 +226,32 @@ class OptimalGiftAnalyzer:
             'Content-Type': 'application/x-www-form-urlencoded',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
         })
-        self.encryption = NetEaseEncryption()
+        self.encryption = NetEaseEncryption(key_pool_size, key_refresh_interval)
         self.api_url = 'https://music.163.com/weapi/vipgift/app/gift/index'
 
+        # 短链接重定向持久化缓存（可选，见 redirect_cache.RedirectCache）
+        self.redirect_cache = redirect_cache
+        # 按状态区分策略的结果缓存（可选，见 result_cache.ResultCache）
+        self.result_cache = result_cache
+        # 按主机的令牌桶限速器（可选，见 flow_control.HostRateLimiter，可在多个分析器间共享）
+        self.rate_limiter = rate_limiter
+        # 临时性错误的重试策略（可选，见 flow_control.RetryPolicy，包含全局重试预算）
+        self.retry_policy = retry_policy
+        # 礼品卡API对冲请求策略（可选，见 flow_control.HedgePolicy）
+        self.hedge_policy = hedge_policy
+        self._hedge_executor = None
+        self._hedge_capacity = 0
+        # 是否在结果中保留API原始响应（api_response），默认不保留以节省内存
+        self.keep_api_response = keep_api_response
+        # 合并同一短链接的并发分析，重复链接只发起一次HEAD+POST
+        self.single_flight = SingleFlight()
+        # 同一张礼品卡可能被多个短链接分享：按 (d, p, userid) 合并进行中的API调用；
+        # 传入 gift_cache（独立的 ResultCache，不与按短链接缓存的 result_cache 共用）时，
+        # 结果也按礼品卡身份写入该缓存，之后的别名链接直接复用
+        self.gift_flight = SingleFlight()
+        self.gift_cache = gift_cache
+        self.gift_cache_hits = 0
+
         # 线程锁
         self.lock = threading.Lock()
         self.results = []
@@ -162,78 +325,119 @@ class OptimalGiftAnalyzer:
             print(f"参数提取失败: {e}")
             return None
     
-    def call_gift_api(self, gift_params):
+    def throttle(self, url):
+        """按目标主机限速，未配置限速器时直接返回"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(url)
+
+    def post_gift_api_once(self, encrypted_data):
+        """发送一次礼品卡API请求"""
+        self.throttle(self.api_url)
+        return self.session.post(
+            self.api_url,
+            data=encrypted_data,
+            timeout=10
+        )
+
+    def post_gift_api(self, encrypted_data):
+        """发送礼品卡API请求，配置了对冲策略时对慢请求补发副本，取先返回的响应"""
+        policy = self.hedge_policy
+        if not policy:
+            return self.post_gift_api_once(encrypted_data)
+
+        policy.record_request()
+        delay = policy.hedge_delay()
+        start = time.monotonic()
+        if delay is None:
+            # 延迟样本不足，先不对冲
+            response = self.post_gift_api_once(encrypted_data)
+            policy.record_latency(time.monotonic() - start)
+            return response
+
+        executor = self._hedge_executor or self.reserve_hedge_capacity()
+        primary_started = threading.Event()
+
+        def send_primary():
+            primary_started.set()
+            return self.post_gift_api_once(encrypted_data)
+
+        primary = executor.submit(send_primary)
+        # 对冲等待从原始请求真正发出时开始计时，线程池排队时间不计入
+        primary_started.wait()
+        start = time.monotonic()
+        done, _ = wait([primary], timeout=delay)
+        if done or not policy.try_hedge():
+            response = primary.result()
+            policy.record_latency(time.monotonic() - start)
+            return response
+
+        hedge = executor.submit(self.post_gift_api_once, encrypted_data)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 落后的请求无法中断，其响应直接丢弃
+                    if future is hedge:
+                        policy.record_hedge_win()
+                    policy.record_latency(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def reserve_hedge_capacity(self, workers=32):
+        """确保对冲线程池能容纳 workers 个并发请求（每个请求最多占用原始+对冲两个线程）"""
+        needed = workers * 2
+        with self.lock:
+            if self._hedge_executor is None or self._hedge_capacity < needed:
+                previous = self._hedge_executor
+                self._hedge_executor = ThreadPoolExecutor(max_workers=needed, thread_name_prefix='gift-hedge')
+                self._hedge_capacity = needed
+                if previous is not None:
+                    # 旧线程池中进行中的请求继续完成
+                    previous.shutdown(wait=False)
+            return self._hedge_executor
+
+    def build_gift_payload(self, gift_params):
+        """构造礼品卡API请求数据（JSON字符串）"""
+        api_data = {
+            'd': gift_params['d'],
+            'p': gift_params['p'],
+            'userid': gift_params['userid'],
+            'app_version': gift_params['app_version'],
+            'dlt': gift_params['dlt'],
+            'csrf_token': ''
+        }
+        return json.dumps(api_data)
+
+    def prepare_gift_requests(self, gift_params_list):
+        """批量预先生成礼品卡API请求体，供 call_gift_api 的 encrypted_data 参数使用"""
+        payloads = [self.build_gift_payload(params) for params in gift_params_list]
+        return self.encryption.encrypt_params_many(payloads)
+
+    def call_gift_api(self, gift_params, encrypted_data=None):
         """直接调用礼品卡API"""
         try:
-            # 构造API请求数据
-            api_data = {
-                'd': gift_params['d'],
-                'p': gift_params['p'],
-                'userid': gift_params['userid'],
-                'app_version': gift_params['app_version'],
-                'dlt': gift_params['dlt'],
-                'csrf_token': ''
-            }
-
-            # 加密参数
-            encrypted_data = self.encryption.encrypt_params(json.dumps(api_data))
+            # 加密参数（可由 prepare_gift_requests 预先生成）
+            if encrypted_data is None:
+                encrypted_data = self.encryption.encrypt_params(self.build_gift_payload(gift_params))
 
             # 发送API请求
-            response = self.session.post(
-                self.api_url,
-                data=encrypted_data,
-                timeout=10
-            )
+            response = self.post_gift_api(encrypted_data)
 
             if response.status_code == 200:
                 try:
-                    result = response.json()
+                    result = json_loads(response.content)
                     return self.parse_api_response(result, gift_params)
-                except json.JSONDecodeError as e:
-                    return {
-                        'status': 'api_exception',
-                        'error_type': 'api_exception',
-                        'error_category': 'json_decode_error',
-                        'error_message': 'API响应格式错误',
-                        'message': 'API响应格式错误',
-                        'technical_details': str(e)
-                    }
-            elif response.status_code == 403:
-                return {
-                    'status': 'api_exception',
-                    'error_type': 'api_exception',
-                    'error_category': 'forbidden',
-                    'error_message': 'API访问被拒绝(403)',
-                    'message': 'API访问被拒绝',
-                    'technical_details': f'HTTP {response.status_code}'
-                }
-            elif response.status_code == 429:
-                return {
-                    'status': 'api_exception',
-                    'error_type': 'api_exception',
-                    'error_category': 'rate_limit',
-                    'error_message': '请求频率过高(429)',
-                    'message': '请求频率过高',
-                    'technical_details': f'HTTP {response.status_code}'
-                }
-            elif response.status_code >= 500:
-                return {
-                    'status': 'api_exception',
-                    'error_type': 'api_exception',
-                    'error_category': 'server_error',
-                    'error_message': f'服务器错误({response.status_code})',
-                    'message': f'服务器错误({response.status_code})',
-                    'technical_details': f'HTTP {response.status_code}'
-                }
-            else:
-                return {
-                    'status': 'api_exception',
-                    'error_type': 'api_exception',
-                    'error_category': 'http_error',
-                    'error_message': f'HTTP错误({response.status_code})',
-                    'message': f'HTTP错误({response.status_code})',
-                    'technical_details': f'HTTP {response.status_code}'
-                }
+                except JSONDecodeError as e:
+                    return self.build_json_error_result(e)
+
+            result = self.build_api_status_result(response.status_code)
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                result['retry_after'] = retry_after
+            return result
 
         except (ConnectionError, Timeout, HTTPError, TooManyRedirects, SSLError, RequestException) as e:
             error_info = self.classify_exception(e)
@@ -249,7 +453,110 @@ class OptimalGiftAnalyzer:
                 'message': f'系统异常: {str(e)}',
                 **error_info
             }
+
+    def gift_identity(self, gift_params):
+        """礼品卡身份：指向同一张礼品卡的不同短链接参数相同"""
+        return (gift_params.get('d'), gift_params.get('p'), gift_params.get('userid'))
+
+    def call_gift_api_deduped(self, gift_params):
+        """按礼品卡身份调用API，同一张礼品卡只查询一次，结果分发给所有别名链接"""
+        identity = self.gift_identity(gift_params)
+        cached = self.get_cached_gift(identity)
+        if cached is not None:
+            return self.refresh_status(cached)
+
+        result, _ = self.gift_flight.do(identity, self.call_and_cache_gift_api, identity, gift_params)
+        return dict(result)
+
+    def call_and_cache_gift_api(self, identity, gift_params):
+        """调用礼品卡API并按礼品卡身份缓存结果"""
+        result = self.call_gift_api(gift_params)
+        if self.gift_cache is not None:
+            self.gift_cache.put(identity, result)
+        return result
+
+    def get_cached_gift(self, identity):
+        """按礼品卡身份读取缓存的结果，未启用缓存或未命中返回None"""
+        if self.gift_cache is None:
+            return None
+        cached = self.gift_cache.get(identity)
+        if cached is not None:
+            with self.lock:
+                self.gift_cache_hits += 1
+        return cached
     
+    def build_json_error_result(self, exception):
+        """API响应JSON解析失败时的结果"""
+        return {
+            'status': 'api_exception',
+            'error_type': 'api_exception',
+            'error_category': 'json_decode_error',
+            'error_message': 'API响应格式错误',
+            'message': 'API响应格式错误',
+            'technical_details': str(exception)
+        }
+
+    def build_api_status_result(self, status_code):
+        """礼品卡API返回非200状态码时的结果"""
+        if status_code == 403:
+            return {
+                'status': 'api_exception',
+                'error_type': 'api_exception',
+                'error_category': 'forbidden',
+                'error_message': 'API访问被拒绝(403)',
+                'message': 'API访问被拒绝',
+                'technical_details': f'HTTP {status_code}'
+            }
+        elif status_code == 429:
+            return {
+                'status': 'api_exception',
+                'error_type': 'api_exception',
+                'error_category': 'rate_limit',
+                'error_message': '请求频率过高(429)',
+                'message': '请求频率过高',
+                'technical_details': f'HTTP {status_code}'
+            }
+        elif status_code >= 500:
+            return {
+                'status': 'api_exception',
+                'error_type': 'api_exception',
+                'error_category': 'server_error',
+                'error_message': f'服务器错误({status_code})',
+                'message': f'服务器错误({status_code})',
+                'technical_details': f'HTTP {status_code}'
+            }
+        else:
+            return {
+                'status': 'api_exception',
+                'error_type': 'api_exception',
+                'error_category': 'http_error',
+                'error_message': f'HTTP错误({status_code})',
+                'message': f'HTTP错误({status_code})',
+                'technical_details': f'HTTP {status_code}'
+            }
+
+    def build_redirect_error_result(self, status_code):
+        """短链接未返回重定向时的结果"""
+        if status_code == 404:
+            return {
+                "status": "invalid",
+                "message": "链接不存在(404)",
+                "error_category": "not_found"
+            }
+        elif status_code >= 500:
+            return {
+                "status": "api_exception",
+                "error_type": "api_exception",
+                "error_category": "server_error",
+                "error_message": f"短链接服务器错误({status_code})",
+                "message": f"短链接服务器错误({status_code})"
+            }
+        else:
+            return {
+                "status": "invalid",
+                "message": f"无效的短链接(HTTP {status_code})"
+            }
+
     def parse_api_response(self, api_result, gift_params):
         """解析API响应"""
         try:
@@ -301,25 +608,14 @@ class OptimalGiftAnalyzer:
             used_count = record.get('usedCount', 0)
 
             # 状态判断逻辑
-            if expire_time > 0 and current_time > expire_time:
-                gift_status = 'expired'
-                status_text = '已过期'
-            elif used_count >= total_count:
-                gift_status = 'claimed'
-                status_text = '已领取完'
-            elif total_count > used_count:
-                gift_status = 'available'
-                status_text = f'可领取 ({total_count - used_count}/{total_count})'
-            else:
-                gift_status = 'unknown'
-                status_text = '状态未知'
+            gift_status, status_text = self.derive_gift_status(expire_time, total_count, used_count, current_time)
 
             # 计算过期时间
             expire_date = ''
             if expire_time > 0:
                 expire_date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(expire_time / 1000))
 
-            return {
+            result = {
                 'status': 'success',
                 'gift_status': gift_status,
                 'status_text': status_text,
@@ -333,9 +629,11 @@ class OptimalGiftAnalyzer:
                 'available_count': max(0, total_count - used_count),
                 'expire_time': expire_time,
                 'expire_date': expire_date,
-                'is_expired': current_time > expire_time if expire_time > 0 else False,
-                'api_response': data
+                'is_expired': current_time > expire_time if expire_time > 0 else False
             }
+            if self.keep_api_response:
+                result['api_response'] = data
+            return result
 
         except Exception as e:
             return {
@@ -343,40 +641,193 @@ class OptimalGiftAnalyzer:
                 'message': f'响应解析失败: {str(e)}'
             }
     
-    def analyze_gift_link(self, short_url):
-        """分析单个礼品链接"""
+    def derive_gift_status(self, expire_time, total_count, used_count, current_time):
+        """根据过期时间和领取数量判断礼品卡状态，返回 (gift_status, status_text)"""
+        if expire_time > 0 and current_time > expire_time:
+            return 'expired', '已过期'
+        elif used_count >= total_count:
+            return 'claimed', '已领取完'
+        elif total_count > used_count:
+            return 'available', f'可领取 ({total_count - used_count}/{total_count})'
+        else:
+            return 'unknown', '状态未知'
+
+    def refresh_status(self, result, now=None):
+        """根据已保存的礼品卡记录在本地重新判断状态（不发送网络请求）
+
+        Args:
+            result: parse_api_response 返回的成功结果
+            now: 当前时间戳(毫秒)，默认为当前时间
+
+        Returns:
+            dict: 更新了 gift_status/status_text/is_expired 的结果副本；
+                  非成功结果原样返回副本
+        """
+        refreshed = dict(result)
+        if result.get('status') != 'success' or 'expire_time' not in result:
+            return refreshed
+
+        now = int(time.time() * 1000) if now is None else now
+        expire_time = result.get('expire_time') or 0
+        gift_status, status_text = self.derive_gift_status(
+            expire_time, result.get('total_count', 0), result.get('used_count', 0), now
+        )
+        refreshed['gift_status'] = gift_status
+        refreshed['status_text'] = status_text
+        refreshed['is_expired'] = now > expire_time if expire_time > 0 else False
+        return refreshed
+
+    def needs_network_check(self, result):
+        """判断结果是否仍需联网复查：只有仍可领取（已领取数量可能变化）或未成功的结果需要"""
+        return result.get('status') != 'success' or result.get('gift_status') not in ('expired', 'claimed')
+
+    def refresh_results(self, results, now=None):
+        """批量本地刷新已保存的结果
+
+        Returns:
+            tuple: (刷新后的全部结果, 仍需联网复查的短链接列表)
+        """
+        refreshed_results = []
+        recheck_urls = []
+        for result in results:
+            refreshed = self.refresh_status(result, now)
+            refreshed_results.append(refreshed)
+            if self.needs_network_check(refreshed) and refreshed.get('short_url'):
+                recheck_urls.append(refreshed['short_url'])
+        return refreshed_results, recheck_urls
+
+    def resolve_short_link(self, short_url):
+        """解析短链接重定向（只发送一次HEAD请求）
+
+        配置了重定向缓存时优先查询缓存。
+        请求异常不会抛出，而是记录在返回结果的 error 字段中。
+        """
+        if self.redirect_cache:
+            cached = self.redirect_cache.get(short_url)
+            if cached:
+                return LinkResolution(short_url, *cached)
+
         try:
-            # 第一步：获取重定向链接
+            self.throttle(short_url)
             resp = self.session.head(short_url, allow_redirects=False, timeout=10)
+            resolution = LinkResolution(short_url, resp.status_code, resp.headers.get('Location'))
+        except Exception as e:
+            return LinkResolution(short_url, error=e)
+
+        self.store_resolution(resolution)
+        return resolution
+
+    def store_resolution(self, resolution):
+        """将固定跳转（301/302）写入重定向缓存"""
+        if self.redirect_cache and resolution.status_code in [301, 302] and resolution.location:
+            self.redirect_cache.put(resolution.short_url, resolution.status_code, resolution.location)
+
+    def lookup_cached_result(self, short_url):
+        """查询结果缓存，未配置缓存或未命中时返回None
+
+        缓存的记录会先在本地按当前时间刷新状态：可领取但已超过过期时间的
+        礼品卡直接判定为已过期（并作为终态写回缓存），无需联网。
+        """
+        if not self.result_cache:
+            return None
+
+        cached = self.result_cache.get(short_url)
+        if cached is None:
+            # TTL已过的可领取记录，如果本地判断已进入终态同样可以直接使用
+            stale = self.result_cache.peek(short_url)
+            if stale is None:
+                return None
+            cached = stale[0]
+
+        refreshed = self.refresh_status(cached)
+        if refreshed.get('gift_status') != cached.get('gift_status'):
+            self.result_cache.put(short_url, refreshed)
+        elif 'from_cache' not in cached:
+            # 过期的TTL条目且状态未进入终态，需要联网复查
+            return None
+
+        refreshed['from_cache'] = True
+        return refreshed
+
+    def analyze_gift_link(self, short_url, resolution=None, check_cache=True):
+        """分析单个礼品链接
+
+        Args:
+            short_url: 短链接
+            resolution: 已有的 LinkResolution，传入时不再重复解析重定向
+            check_cache: 是否先查询结果缓存（调用方已查询过时传False）
+        """
+        if check_cache:
+            cached = self.lookup_cached_result(short_url)
+            if cached is not None:
+                return cached
+
+        result, _ = self.single_flight.do(
+            normalize_short_url(short_url), self.fetch_and_cache_gift_link, short_url, resolution
+        )
+        # 并发调用方共享同一结果，各自拿到独立副本并保留自己的原始链接
+        result = dict(result)
+        result['short_url'] = short_url
+        return result
+
+    def fetch_and_cache_gift_link(self, short_url, resolution=None):
+        """通过网络分析礼品链接并写入结果缓存"""
+        result = self.fetch_gift_link(short_url, resolution)
+        if self.result_cache:
+            self.result_cache.put(short_url, result)
+        return result
+
+    def fetch_gift_link(self, short_url, resolution=None):
+        """通过网络分析单个礼品链接（不经过结果缓存）
+
+        配置了重试策略时，临时性错误按指数退避自动重试，
+        结果中记录 retry_count（重试次数）和 retry_backoff（累计等待秒数）。
+        """
+        policy = self.retry_policy
+        if not policy:
+            return self.fetch_gift_link_once(short_url, resolution)
+
+        attempt = 1
+        total_backoff = 0.0
+        while True:
+            # 重定向只在尚未成功解析时请求，API阶段失败重试时复用
+            if resolution is None:
+                resolution = self.resolve_short_link(short_url)
+            policy.record_attempt()
+            result = self.fetch_gift_link_once(short_url, resolution)
+            if not policy.should_retry(result, attempt):
+                break
+
+            delay = policy.backoff(attempt, result.get('retry_after'))
+            time.sleep(delay)
+            total_backoff += delay
+            attempt += 1
+            if resolution.error or resolution.status_code not in [301, 302]:
+                resolution = None
+
+        result['retry_count'] = attempt - 1
+        result['retry_backoff'] = round(total_backoff, 3)
+        return result
 
-            if resp.status_code not in [301, 302]:
-                if resp.status_code == 404:
-                    return {
-                        "status": "invalid",
-                        "message": "链接不存在(404)",
-                        "error_category": "not_found"
-                    }
-                elif resp.status_code >= 500:
-                    return {
-                        "status": "api_exception",
-                        "error_type": "api_exception",
-                        "error_category": "server_error",
-                        "error_message": f"短链接服务器错误({resp.status_code})",
-                        "message": f"短链接服务器错误({resp.status_code})"
-                    }
-                else:
-                    return {
-                        "status": "invalid",
-                        "message": f"无效的短链接(HTTP {resp.status_code})"
-                    }
-
-            if 'Location' not in resp.headers:
+    def fetch_gift_link_once(self, short_url, resolution=None):
+        """通过网络分析单个礼品链接（单次尝试）"""
+        try:
+            # 第一步：获取重定向链接
+            if resolution is None:
+                resolution = self.resolve_short_link(short_url)
+            if resolution.error:
+                raise resolution.error
+
+            if resolution.status_code not in [301, 302]:
+                return self.build_redirect_error_result(resolution.status_code)
+
+            if not resolution.location:
                 return {
                     "status": "invalid",
                     "message": "短链接缺少重定向信息"
                 }
 
-            redirect_url = resp.headers['Location']
+            redirect_url = resolution.location
 
             if 'gift-receive' not in redirect_url:
                 return {
@@ -392,8 +843,10 @@ class OptimalGiftAnalyzer:
                     "message": "参数提取失败"
                 }
 
-            # 第三步：调用API获取状态
-            api_result = self.call_gift_api(gift_params)
+            # 第三步：调用API获取状态（别名链接共享同一张礼品卡的查询结果）
+            api_result = self.call_gift_api_deduped(gift_params)
+            # 本链接实际发送了请求，按礼品卡身份命中缓存也不算缓存结果（并发控制据此采样延迟）
+            api_result.pop('from_cache', None)
 
             # 添加原始信息
             api_result['short_url'] = short_url
@@ -418,17 +871,49 @@ class OptimalGiftAnalyzer:
                 **error_info
             }
     
-    def batch_analyze(self, short_urls, max_workers=10):
-        """批量分析礼品链接"""
-        print(f"[🚀 开始分析] 共 {len(short_urls)} 个链接，使用 {max_workers} 个线程")
+    def analyze_with_controller(self, short_url, controller):
+        """在自适应并发控制器的约束下分析单个链接"""
+        controller.acquire()
+        result = None
+        start = time.monotonic()
+        try:
+            result = self.analyze_gift_link(short_url)
+            return result
+        finally:
+            controller.release(result, time.monotonic() - start)
+
+    def batch_analyze(self, short_urls, max_workers=10, concurrency_controller=None):
+        """批量分析礼品链接
+
+        Args:
+            short_urls: 短链接列表
+            max_workers: 固定线程数（未使用并发控制器时）
+            concurrency_controller: AdaptiveConcurrencyController，传入时
+                线程池大小取控制器上限，实际并发数由控制器动态调整
+        """
+        if concurrency_controller:
+            pool_size = concurrency_controller.max_limit
+            print(f"[🚀 开始分析] 共 {len(short_urls)} 个链接，自适应并发 "
+                  f"(初始 {concurrency_controller.current_limit}，上限 {pool_size})")
+        else:
+            pool_size = max_workers
+            print(f"[🚀 开始分析] 共 {len(short_urls)} 个链接，使用 {max_workers} 个线程")
+        if self.hedge_policy:
+            self.reserve_hedge_capacity(pool_size)
         
         results = []
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
             # 提交所有任务
-            future_to_url = {
-                executor.submit(self.analyze_gift_link, url): url 
-                for url in short_urls
-            }
+            if concurrency_controller:
+                future_to_url = {
+                    executor.submit(self.analyze_with_controller, url, concurrency_controller): url
+                    for url in short_urls
+                }
+            else:
+                future_to_url = {
+                    executor.submit(self.analyze_gift_link, url): url 
+                    for url in short_urls
+                }
             
             # 收集结果
             completed = 0
@@ -456,40 +941,98 @@ class OptimalGiftAnalyzer:
                         'message': str(e)
                     })
                     completed += 1
+
+        if self.redirect_cache:
+            stats = self.redirect_cache.stats()
+            print(f"[🗃️ 重定向缓存] 命中 {stats['hits']} | 未命中 {stats['misses']} | 命中率 {stats['hit_rate']*100:.1f}%")
+        if self.hedge_policy:
+            stats = self.hedge_policy.stats()
+            print(f"[⚡ 对冲请求] 补发 {stats['hedged']}/{stats['requests']} | 副本先返回 {stats['hedge_wins']} 次")
+        if self.retry_policy:
+            stats = self.retry_policy.budget.stats()
+            print(f"[🔁 自动重试] 重试 {stats['retries']} 次 | 预算不足放弃 {stats['rejected']} 次")
+        if concurrency_controller:
+            stats = concurrency_controller.stats()
+            print(f"[🎚️ 并发控制] 最终并发 {stats['limit']} | 拥塞事件 {stats['congestion_events']}")
+        if self.result_cache:
+            stats = self.result_cache.stats()
+            print(f"[🗃️ 结果缓存] 命中 {stats['hits']} | 未命中 {stats['misses']} | 终态 {stats['terminal']}/{stats['size']}")
+        if self.single_flight.shared_count:
+            print(f"[🔗 请求合并] {self.single_flight.shared_count} 次重复链接共享了进行中的查询")
+        alias_count = self.gift_flight.shared_count + self.gift_cache_hits
+        if alias_count:
+            print(f"[🔗 礼品卡去重] {alias_count} 个别名链接复用了同一张礼品卡的查询结果")
         
         return results
     
     def save_results(self, results, filename='gift_analysis_results.json'):
-        """保存分析结果"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        """保存分析结果（扩展名为 .msgpack/.mpk 时保存为 msgpack 二进制格式，否则为JSON）"""
+        serializers.save_results(results, filename)
         print(f"[💾 保存完成] 结果已保存到 {filename}")
+
+    def load_results(self, filename='gift_analysis_results.json'):
+        """读取 save_results 保存的分析结果"""
+        return serializers.load_results(filename)
     
-    def print_statistics(self, results):
-        """打印统计信息"""
-        total = len(results)
-        success_count = len([r for r in results if r['status'] == 'success'])
+    def collect_statistics(self, results):
+        """汇总成功结果的状态分布、礼品类型分布和价值
 
-        if success_count > 0:
-            status_count = {}
-            gift_types = {}
-            total_value = 0
-            available_value = 0
+        results 为 ResultStore 时使用列式（向量化）统计；普通列表直接遍历一次，
+        不为一次性统计额外构建列式存储。
+        """
+        if isinstance(results, ResultStore):
+            success = results.where('status', 'success')
+            return {
+                'total': len(results),
+                'success_count': results.count(success),
+                'status_count': results.value_counts('gift_status', success),
+                'gift_types': results.value_counts('gift_type', success),
+                'total_value': results.sum('gift_price', success),
+                'available_value': results.sum('gift_price', success & results.where('gift_status', 'available')),
+            }
 
-            for result in results:
-                if result['status'] == 'success':
-                    status = result.get('gift_status', 'unknown')
-                    status_count[status] = status_count.get(status, 0) + 1
+        success_count = 0
+        status_count = {}
+        gift_types = {}
+        total_value = 0
+        available_value = 0
 
-                    # 统计礼品类型
-                    gift_type = result.get('gift_type', 'Unknown')
-                    gift_types[gift_type] = gift_types.get(gift_type, 0) + 1
+        for result in results:
+            if result['status'] == 'success':
+                success_count += 1
+                status = result.get('gift_status', 'unknown')
+                status_count[status] = status_count.get(status, 0) + 1
 
-                    # 统计价值
-                    price = result.get('gift_price', 0)
-                    total_value += price
-                    if status == 'available':
-                        available_value += price
+                # 统计礼品类型
+                gift_type = result.get('gift_type', 'Unknown')
+                gift_types[gift_type] = gift_types.get(gift_type, 0) + 1
+
+                # 统计价值
+                price = result.get('gift_price', 0)
+                total_value += price
+                if status == 'available':
+                    available_value += price
+
+        return {
+            'total': len(results),
+            'success_count': success_count,
+            'status_count': status_count,
+            'gift_types': gift_types,
+            'total_value': total_value,
+            'available_value': available_value,
+        }
+
+    def print_statistics(self, results):
+        """打印统计信息（results 可以是结果列表或 ResultStore）"""
+        stats = self.collect_statistics(results)
+        total = stats['total']
+        success_count = stats['success_count']
+
+        if success_count > 0:
+            status_count = stats['status_count']
+            gift_types = stats['gift_types']
+            total_value = stats['total_value']
+            available_value = stats['available_value']
 
             print(f"\n[📊 统计结果]")
             print(f"总链接数: {total}")
@@ -512,22 +1055,28 @@ class OptimalGiftAnalyzer:
             print(f"可领取率: {(available_value/total_value*100):.1f}%" if total_value > 0 else "可领取率: 0%")
 
     def filter_and_save(self, results, save_available=True, save_expired=True, save_claimed=True):
-        """过滤并保存不同状态的礼品卡"""
-        available_links = []
-        expired_links = []
-        claimed_links = []
+        """过滤并保存不同状态的礼品卡（results 可以是结果列表或 ResultStore）"""
+        if isinstance(results, ResultStore):
+            success = results.where('status', 'success')
+            available_links = results.select('short_url', success & results.where('gift_status', 'available'))
+            expired_links = results.select('short_url', success & results.where('gift_status', 'expired'))
+            claimed_links = results.select('short_url', success & results.where('gift_status', 'claimed'))
+        else:
+            available_links = []
+            expired_links = []
+            claimed_links = []
 
-        for result in results:
-            if result['status'] == 'success':
-                status = result.get('gift_status', 'unknown')
-                short_url = result.get('short_url', '')
+            for result in results:
+                if result['status'] == 'success':
+                    status = result.get('gift_status', 'unknown')
+                    short_url = result.get('short_url', '')
 
-                if status == 'available':
-                    available_links.append(short_url)
-                elif status == 'expired':
-                    expired_links.append(short_url)
-                elif status == 'claimed':
-                    claimed_links.append(short_url)
+                    if status == 'available':
+                        available_links.append(short_url)
+                    elif status == 'expired':
+                        expired_links.append(short_url)
+                    elif status == 'claimed':
+                        claimed_links.append(short_url)
 
         # 保存可领取的链接
         if save_available and available_links:
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+"""
+页面流式扫描与解析
+VIP页面边接收边扫描，找到最高优先级的 expireTime 字段后立即关闭连接，不下载完整页面；
+过期时间和状态提示都直接在原始字节上一次扫描得出，无需解码整个页面；
+页面内嵌的状态对象（__INITIAL_STATE__ 等）线性查找，只解析需要的键
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from itertools import accumulate
+
+# 单个页面最多读取的字节数
+DEFAULT_MAX_BYTES = 512 * 1024
+DEFAULT_CHUNK_SIZE = 16 * 1024
+# 相邻两块之间重叠扫描的字节数，需大于停止模式可能匹配的最大长度
+SCAN_OVERLAP = 256
+
+# VIP页面状态提示
+VIP_STATUS_INDICATORS = {
+    '已过期': 'expired',
+    '活动已结束': 'ended',
+    '邀请已失效': 'invalid',
+    '链接已失效': 'invalid',
+    '不存在': 'not_found',
+    '已领取': 'claimed',
+    '领取成功': 'claimed',
+    '活动火爆': 'busy',
+    '请稍后重试': 'retry',
+}
+
+# 礼品卡页面状态提示
+GIFT_STATUS_INDICATORS = {
+    '礼品卡不存在': 'invalid',
+    '链接已失效': 'invalid',
+    '已过期': 'expired',
+    '已领取完': 'claimed',
+    '礼品卡已被领完': 'claimed',
+    '活动已结束': 'expired'
+}
+
+# server 按优先级依次尝试的过期时间字段
+EXPIRE_FIELD_PATTERNS = [
+    re.compile(rb'expireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?'),
+    re.compile(rb'"expireTime"\s*:\s*(\d{13})'),
+    re.compile(rb'tokenExpireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?'),
+]
+
+# 只在命中最高优先级的 expireTime 字段时停止：tokenExpireTime 等字段优先级较低，
+# 遇到后仍要继续读取，否则会截掉页面后面的 expireTime
+EXPIRE_STOP_PATTERN = re.compile(rb'expireTime["\']?\s{0,20}[=:]\s{0,20}["\']?\d{13}')
+
+
+def extract_expire_field(html):
+    """按 EXPIRE_FIELD_PATTERNS 的优先级提取过期时间，找不到时返回None"""
+    for pattern in EXPIRE_FIELD_PATTERNS:
+        match = pattern.search(html)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+# 桌面端VIP页面：只在命中 EXPIRE_PATTERNS 中优先级最高的 "expireTime": 时间戳 时停止。
+# 其他字段（expire_time、expireTime= 等）优先级较低，页面状态提示只在找不到过期时间时使用，
+# 遇到它们都要继续读取到字节上限，否则会截掉后面优先级更高的 expireTime
+VIP_PAGE_STOP_PATTERN = re.compile(rb'["\']?expireTime["\']?\s{0,20}:\s{0,20}\d{13}', re.IGNORECASE)
+
+
+class IndicatorMatcher:
+    """多关键词匹配：关键词预先编码为字节，一次扫描找出页面中出现的全部关键词
+
+    所有关键词合并为一个正则，长的关键词优先；每次命中后从命中位置的下一个字节继续，
+    因此互相重叠的关键词都能找到，被命中关键词包含的较短关键词直接补全。
+    """
+
+    def __init__(self, indicators, encoding='utf-8'):
+        self.indicators = dict(indicators)  # 关键词 -> 状态，顺序即优先级
+        encoded = {indicator.encode(encoding): indicator for indicator in self.indicators}
+        ordered = sorted(encoded, key=len, reverse=True)
+        self.pattern = re.compile(b'|'.join(re.escape(key) for key in ordered))
+        # 命中的关键词 -> 其中包含的所有关键词（含自身）
+        self.contained = {key: [encoded[other] for other in ordered if other in key] for key in ordered}
+
+    def find_all(self, data):
+        """返回页面字节中出现的全部关键词集合"""
+        found = set()
+        match = self.pattern.search(data)
+        while match:
+            found.update(self.contained[match.group()])
+            # UTF-8 关键词不会从多字节字符中间开始匹配，逐字节前进是安全的
+            match = self.pattern.search(data, match.start() + 1)
+        return found
+
+    def first(self, data):
+        """按关键词顺序返回第一个出现在页面中的 (关键词, 状态)，没有时返回None"""
+        found = self.find_all(data)
+        if not found:
+            return None
+        for indicator, status in self.indicators.items():
+            if indicator in found:
+                return indicator, status
+        return None
+
+
+VIP_STATUS_MATCHER = IndicatorMatcher(VIP_STATUS_INDICATORS)
+GIFT_STATUS_MATCHER = IndicatorMatcher(GIFT_STATUS_INDICATORS)
+
+
+def decode_body(data, encoding=None):
+    """解码已读取的页面内容（截断处的不完整字符会被替换）"""
+    # requests 对未声明charset的text/*响应默认使用ISO-8859-1，网易页面实际为UTF-8
+    if not encoding or encoding.lower() == 'iso-8859-1':
+        encoding = 'utf-8'
+    return data.decode(encoding, errors='replace')
+
+
+def read_until(response, stop_pattern, max_bytes=DEFAULT_MAX_BYTES, chunk_size=DEFAULT_CHUNK_SIZE):
+    """流式读取 requests 响应（需以 stream=True 发起），命中 stop_pattern 或达到 max_bytes 时停止并关闭连接
+
+    Returns:
+        tuple: (已读取的bytes, 是否命中停止模式)
+    """
+    buffer = bytearray()
+    scan_from = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            buffer += chunk
+            if stop_pattern.search(buffer, scan_from):
+                return bytes(buffer), True
+            if len(buffer) >= max_bytes:
+                break
+            scan_from = max(0, len(buffer) - SCAN_OVERLAP)
+    finally:
+        response.close()
+    return bytes(buffer), False
+
+
+async def read_until_async(response, stop_pattern, max_bytes=DEFAULT_MAX_BYTES, chunk_size=DEFAULT_CHUNK_SIZE):
+    """read_until 的 aiohttp 版本，提前停止时直接关闭连接而不是读完剩余内容
+
+    Returns:
+        tuple: (已读取的bytes, 是否命中停止模式)
+    """
+    buffer = bytearray()
+    scan_from = 0
+    async for chunk in response.content.iter_chunked(chunk_size):
+        buffer += chunk
+        if stop_pattern.search(buffer, scan_from):
+            response.close()
+            return bytes(buffer), True
+        if len(buffer) >= max_bytes:
+            response.close()
+            break
+        scan_from = max(0, len(buffer) - SCAN_OVERLAP)
+    return bytes(buffer), False
+
+
+# VIP页面中过期时间的匹配模式，按优先级排列（编号即日志中的“模式N”）
+EXPIRE_PATTERNS = [
+    # JavaScript中的expireTime比较
+    r'expireTime["\']?\s*[)}\]]*\s*>=?\s*Date\.now\(\)',
+    # JSON格式的expireTime
+    r'["\']?expireTime["\']?\s*:\s*(\d{13})',
+    r'expireTime["\']?\s*=\s*(\d{13})',
+    # 对象属性访问
+    r'\.expireTime\s*>=?\s*Date\.now\(\)',
+    # 更宽泛的13位时间戳匹配
+    r'expire[^:]*:\s*(\d{13})',
+    r'time[^:]*:\s*(\d{13})',
+    # 新增模式
+    r'expireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
+    r'expire_time["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
+    r'"expireTime"\s*:\s*(\d{13})',
+    r"'expireTime'\s*:\s*(\d{13})",
+    r'tokenExpireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
+]
+
+# 没有明确字段时的通用13位时间戳
+TIMESTAMP_PATTERN = r'\b(1[6-9]\d{11})\b'
+
+
+class ExpireTimeExtractor:
+    """一次扫描提取VIP页面中的过期时间
+
+    所有带捕获组的模式与通用时间戳合并为一个预编译的零宽正则，
+    finditer 在每个位置按优先级报告第一个能匹配的模式，一次扫描即可得到
+    每个模式在页面中最靠前的匹配，之后按原有优先级选取：编号小的模式优先。
+
+    页面可以是 str 或原始 bytes；bytes 直接扫描，不需要解码（非ASCII字节按单词边界处理）。
+    """
+
+    def __init__(self):
+        # 不含捕获组的模式（如 Date.now() 比较）只能说明存在过期判断，无法给出时间戳
+        grouped = [(i + 1, p) for i, p in enumerate(EXPIRE_PATTERNS) if re.compile(p).groups]
+        self.group_patterns = {}  # 捕获组序号 -> 模式编号
+        for group, (index, _) in enumerate(grouped, start=1):
+            self.group_patterns[group] = index
+        self.timestamp_group = len(grouped) + 1
+        self.top_index = grouped[0][0]
+        # 单个模式（小写），供按已知模式和位置直接匹配
+        self.single_patterns = {index: re.compile(p.lower()) for index, p in grouped}
+        self.single_patterns_bytes = {index: re.compile(p.lower().encode('ascii')) for index, p in grouped}
+
+        alternatives = '|'.join(p for _, p in grouped) + '|' + TIMESTAMP_PATTERN
+        # 先用首字符过滤候选位置（所有模式都以引号、e、t 或 1 开头）
+        # 页面先转为小写再匹配，比 IGNORECASE 快；小写后长度变化的页面退回 IGNORECASE
+        self.scan_pattern = re.compile(r'(?=[\'"et1])(?=' + alternatives.lower() + ')')
+        self.scan_pattern_ci = re.compile(r'(?=[\'"et1])(?=' + alternatives + ')', re.IGNORECASE)
+        # bytes.lower() 只转换ASCII字母，长度不变
+        self.scan_pattern_bytes = re.compile(self.scan_pattern.pattern.encode('ascii'))
+
+    def extract(self, content, now=None):
+        """提取过期时间
+
+        Returns:
+            tuple: (过期时间戳(毫秒), 匹配方式)，匹配方式为 '模式N'、'通用匹配' 或 '最大时间戳'；
+                   未找到时返回 (None, None)
+        """
+        expire_time, matched_pattern, _, _ = self.locate(content, now)
+        return expire_time, matched_pattern
+
+    def match_at(self, content, index, offset, window=4096):
+        """只用第 index 个模式在 offset 附近匹配（同一模板的页面结构相同）
+
+        Returns:
+            tuple: (过期时间戳, 实际匹配位置)，未匹配时返回 (None, None)
+        """
+        if isinstance(content, (bytes, bytearray)):
+            compiled = self.single_patterns_bytes[index]
+        else:
+            compiled = self.single_patterns[index]
+        # 只转换附近区域的大小写，不处理整个页面
+        start = max(0, offset - window)
+        region = content[start:offset + window]
+        lowered = region.lower()
+        if len(lowered) != len(region):
+            return None, None
+
+        match = compiled.match(lowered, offset - start)
+        if match is None:
+            match = compiled.search(lowered)
+        if match is None:
+            return None, None
+        return int(match.group(1)), start + match.start()
+
+    def locate(self, content, now=None):
+        """提取过期时间并给出命中的模式编号和位置
+
+        Returns:
+            tuple: (过期时间戳, 匹配方式, 模式编号, 匹配位置)；通用匹配或未找到时模式编号和位置为None
+        """
+        lowered = content.lower()
+        if isinstance(content, (bytes, bytearray)):
+            matches = self.scan_pattern_bytes.finditer(lowered)
+        elif len(lowered) == len(content):
+            matches = self.scan_pattern.finditer(lowered)
+        else:
+            matches = self.scan_pattern_ci.finditer(content)
+
+        best = {}  # 模式编号 -> 该模式最靠前匹配到的时间戳
+        timestamps = []
+        for match in matches:
+            group = match.lastindex
+            if group == self.timestamp_group:
+                timestamps.append(int(match.group(group)))
+                continue
+
+            index = self.group_patterns[group]
+            if index == self.top_index:
+                # 最高优先级的模式已命中，后面的内容不会改变结果
+                return int(match.group(group)), f"模式{index}", index, match.start()
+            best.setdefault(index, (int(match.group(group)), match.start()))
+
+        if best:
+            index = min(best)
+            expire_time, position = best[index]
+            return expire_time, f"模式{index}", index, position
+
+        if timestamps:
+            now = int(time.time() * 1000) if now is None else now
+            future_timestamps = [ts for ts in timestamps if ts > now]
+            if future_timestamps:
+                return max(future_timestamps), "通用匹配", None, None
+            return max(timestamps), "最大时间戳", None, None
+
+        return None, None, None, None
+
+
+class ExtractionStrategyCache:
+    """按活动ID缓存VIP页面的提取策略（线程安全）
+
+    同一活动的页面使用同一模板，上次命中的模式和字节位置几乎总能再次命中：
+    先只用该模式在该位置附近匹配，未命中时才完整扫描并更新策略。
+    """
+
+    def __init__(self, extractor=None, max_entries=1024, window=4096):
+        self.extractor = extractor or ExpireTimeExtractor()
+        self.max_entries = max_entries
+        self.window = window  # 在记录位置前后多大范围内查找
+
+        self.lock = threading.Lock()
+        self.strategies = OrderedDict()  # activity_id -> (模式编号, 字节位置)
+        self.hits = 0
+        self.misses = 0
+
+    def extract(self, activity_id, content, now=None):
+        """提取过期时间，返回值同 ExpireTimeExtractor.extract"""
+        if activity_id is None:
+            return self.extractor.extract(content, now)
+
+        with self.lock:
+            strategy = self.strategies.get(activity_id)
+            if strategy is not None:
+                self.strategies.move_to_end(activity_id)
+
+        if strategy is not None:
+            index, offset = strategy
+            expire_time, position = self.extractor.match_at(content, index, offset, self.window)
+            if expire_time is not None:
+                with self.lock:
+                    self.hits += 1
+                    self.strategies[activity_id] = (index, position)
+                return expire_time, f"模式{index}"
+
+        expire_time, matched_pattern, index, position = self.extractor.locate(content, now)
+        with self.lock:
+            self.misses += 1
+            if index is not None:
+                self.strategies[activity_id] = (index, position)
+                self.strategies.move_to_end(activity_id)
+                while len(self.strategies) > self.max_entries:
+                    self.strategies.popitem(last=False)
+        return expire_time, matched_pattern
+
+    def clear(self):
+        """清空策略"""
+        with self.lock:
+            self.strategies.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self.lock:
+            size = len(self.strategies)
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'activities': size
+        }
+
+
+# 页面内嵌状态对象的赋值语句，按优先级排列
+STATE_MARKERS = [
+    re.compile(rb'window\.__INITIAL_STATE__\s*=\s*(?=\{)'),
+    re.compile(rb'window\.INITIAL_STATE\s*=\s*(?=\{)'),
+    re.compile(rb'__NUXT__\s*=\s*(?=\{)'),
+]
+
+# 状态对象中礼品数据所在的键
+GIFT_DATA_KEYS = (b'gift', b'giftInfo', b'linkCard', b'card')
+
+# 单个状态对象最多扫描的字节数、最大嵌套深度
+STATE_MAX_BYTES = 4 * 1024 * 1024
+STATE_MAX_DEPTH = 32
+
+# 完整的JSON字符串（展开循环写法，各分支互斥，回溯有限）
+_JSON_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# 只关心括号深度，方括号与花括号同等对待
+_BRACKET_TABLE = bytes.maketrans(b'[]', b'{}')
+_NON_BRACKETS = bytes(sorted(set(range(256)) - set(b'{[}]')))
+_BRACKET_STEP = {ord('{'): 1, ord('}'): -1}
+_JSON_DECODER = json.JSONDecoder()
+# 解析错误距窗口末尾不超过该字符数时视为值被截断（最长的字面量 -Infinity 为9个字符）
+_TRUNCATION_TAIL = 10
+
+
+def strip_json_strings(segment):
+    """去掉片段中完整的JSON字符串；片段结束于字符串内部时返回None"""
+    if b'\\"' not in segment:
+        # 没有转义引号时按引号切分即可，偶数段在字符串外
+        parts = segment.split(b'"')
+        if len(parts) % 2 == 0:
+            return None
+        return b''.join(parts[::2])
+
+    stripped = _JSON_STRING.sub(b'', segment)
+    if b'"' in stripped:
+        return None
+    return stripped
+
+
+def bracket_depth_change(segment):
+    """统计已去掉字符串的片段中括号深度的变化，返回 (总变化量, 过程中最多下降多少(<=0))"""
+    brackets = segment.translate(_BRACKET_TABLE, _NON_BRACKETS)
+    change = 2 * brackets.count(b'{') - len(brackets)
+    # 一次遍历累计深度，过程中的最小值即最多下降多少
+    lowest = min(accumulate(map(_BRACKET_STEP.__getitem__, brackets), initial=0))
+    return change, lowest
+
+
+def find_key_value(html, start, end, key_pattern, max_depth=STATE_MAX_DEPTH):
+    """在 start 处开始的JSON对象中查找第一个匹配 key_pattern 的键，返回其非空值
+
+    先用正则直接定位候选键，再检查候选键之前的片段：片段结束于字符串内部
+    说明候选键只是字符串内容；括号深度降到0说明状态对象已经结束。
+    整个过程是线性的，只解析命中键的值，不构建状态树的其他部分。
+    """
+    # 跳过开头的 {，之后深度降到0即对象结束
+    depth = 1
+    scanned = start + 1
+    for candidate in key_pattern.finditer(html, start, end):
+        segment = strip_json_strings(html[scanned:candidate.start()])
+        if segment is None:
+            # 候选键位于字符串内部
+            continue
+
+        change, lowest = bracket_depth_change(segment)
+        if depth + lowest <= 0:
+            return None
+        depth += change
+        scanned = candidate.start()
+        if depth > max_depth:
+            continue
+
+        value = decode_json_value(html, candidate.end(), end)
+        if value:
+            return value
+    return None
+
+
+def decode_json_value(html, start, end, window=64 * 1024):
+    """解析 start 处的JSON值（只解码值所在的区域），解析失败返回None"""
+    # 大多数值都很小，先只解码一个窗口；只有值被窗口截断时才解码到 end，
+    # 值本身不是合法JSON时直接放弃，否则每个候选位置都要解码整个区域
+    stop = min(end, start + window)
+    while True:
+        text = html[start:stop].decode('utf-8', errors='replace')
+        try:
+            value, index = _JSON_DECODER.raw_decode(text)
+            truncated = index == len(text)  # 数字等值恰好到窗口末尾时可能不完整
+        except json.JSONDecodeError as e:
+            value = None
+            # 错误出现在窗口末尾附近（true/null 等字面量或 \uXXXX 转义被截断），
+            # 或字符串一直到窗口末尾都没有闭合，说明值被截断
+            truncated = len(text) - e.pos <= _TRUNCATION_TAIL or e.msg.startswith('Unterminated string')
+        if stop == end or not truncated:
+            return value
+        stop = end
+
+
+def find_state_value(html, keys=GIFT_DATA_KEYS, max_bytes=STATE_MAX_BYTES, max_depth=STATE_MAX_DEPTH):
+    """在页面内嵌的状态对象中查找第一个指定键的非空值
+
+    按 STATE_MARKERS 的顺序定位状态对象，在每个对象中按文档顺序查找键。
+
+    Returns:
+        命中键对应的值（已解析的JSON），未找到时返回None
+    """
+    key_pattern = re.compile(rb'"(?:' + b'|'.join(re.escape(key) for key in keys) + rb')"\s*:\s*')
+    for marker in STATE_MARKERS:
+        found = marker.search(html)
+        if not found:
+            continue
+        start = found.end()
+        value = find_key_value(html, start, min(len(html), start + max_bytes), key_pattern, max_depth)
+        if value:
+            return value
+    return None
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VIP页面解析基准测试
+在合成的大页面上对比逐模式 re.findall 的原始实现与一次扫描的 ExpireTimeExtractor
+（分别以解码后的文本和原始字节为输入），并校验结果一致
+"""
+
+import json
+import random
+import re
+import statistics
+import time
+
+from page_scan import EXPIRE_PATTERNS, TIMESTAMP_PATTERN, ExpireTimeExtractor
+
+DEFAULT_SIZES_KB = [64, 512, 2048]
+
+# 合成页面使用的片段，包含大量 time/expire 相关但不带时间戳的干扰项
+FILLER_SNIPPETS = [
+    '<div class="item"><span>{word}</span></div>\n',
+    'var {word} = function(e) {{ return e && e.{word}; }};\n',
+    '{{"{word}": "{word}", "createTime": "{date}", "updateTime": null}},\n',
+    '"expireDesc": "{word}", "timeout": {small},\n',
+    'if (data.remainTime > 0) {{ render("{word}"); }}\n',
+    '.{word}{{margin:0;padding:{small}px;}}\n',
+    '<script>window.__track = {{"time": "{date}", "page": "{word}"}};</script>\n',
+]
+WORDS = ['vip', 'invite', 'cashier', 'member', 'song', 'album', 'banner', 'button', 'layout', 'price']
+
+
+def legacy_extract(content, now):
+    """原始实现：逐个模式 re.findall 扫描整页，再做通用13位时间戳匹配（用作正确性参照）"""
+    for i, pattern in enumerate(EXPIRE_PATTERNS):
+        matches = re.findall(pattern, content, re.IGNORECASE)
+        for match in matches:
+            if isinstance(match, str) and match.isdigit() and len(match) == 13:
+                return int(match), f"模式{i+1}"
+
+    timestamps = re.findall(TIMESTAMP_PATTERN, content)
+    if timestamps:
+        future_timestamps = [int(ts) for ts in timestamps if int(ts) > now]
+        if future_timestamps:
+            return max(future_timestamps), "通用匹配"
+        return max(int(ts) for ts in timestamps), "最大时间戳"
+    return None, None
+
+
+def build_filler(size, rng):
+    """生成约 size 字节的干扰内容"""
+    parts = []
+    total = 0
+    while total < size:
+        snippet = rng.choice(FILLER_SNIPPETS).format(
+            word=rng.choice(WORDS), date='2024-01-01 12:00', small=rng.randint(0, 99)
+        )
+        parts.append(snippet)
+        total += len(snippet)
+    return ''.join(parts)
+
+
+def build_pages(size, now, seed=None):
+    """构造各场景的合成页面，返回 {场景名: 页面内容}"""
+    rng = random.Random(seed)
+    future = now + 7 * 86400000
+    past = now - 7 * 86400000
+    filler = build_filler(size, rng)
+    half = len(filler) // 2
+
+    return {
+        # 标准JSON字段位于页面末尾
+        'json_tail': filler + f'{{"expireTime": {future}}}',
+        # 只有 tokenExpireTime，位于页面中部
+        'token_middle': filler[:half] + f'tokenExpireTime={future};' + filler[half:],
+        # Date.now() 比较与 JSON 字段同时存在
+        'date_compare': filler[:half] + f'if (expireTime >= Date.now()) {{}}' + filler[half:]
+                        + f'window.cfg = {{"expireTime":{future}}};',
+        # 没有过期字段，只有零散的13位时间戳
+        'generic_timestamps': filler[:half] + f' {past} ' + filler[half:] + f' {future} ',
+        # 页面中没有任何时间戳
+        'none': filler,
+    }
+
+
+def measure(func, content, now, iterations):
+    """测量单次解析耗时（毫秒）"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(content, now)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': statistics.fmean(samples),
+        'median_ms': samples[len(samples) // 2],
+        'min_ms': samples[0],
+    }
+
+
+def run_benchmark(sizes_kb=None, iterations=20, seed=None, cases=None):
+    """运行基准测试并返回结果字典"""
+    sizes_kb = sizes_kb or DEFAULT_SIZES_KB
+    now = int(time.time() * 1000)
+    extractor = ExpireTimeExtractor()
+
+    report = {
+        'seed': seed,
+        'iterations': iterations,
+        'results': []
+    }
+
+    for size_kb in sizes_kb:
+        pages = build_pages(size_kb * 1024, now, seed=seed)
+        for name, content in pages.items():
+            if cases and name not in cases:
+                continue
+
+            raw = content.encode('utf-8')
+            expected = legacy_extract(content, now)
+            actual = extractor.extract(content, now)
+            actual_bytes = extractor.extract(raw, now)
+            legacy = measure(legacy_extract, content, now, iterations)
+            one_pass = measure(extractor.extract, content, now, iterations)
+            one_pass_bytes = measure(extractor.extract, raw, now, iterations)
+
+            report['results'].append({
+                'case': name,
+                'size_kb': size_kb,
+                'consistent': expected == actual == actual_bytes,
+                'result': list(actual),
+                'legacy': legacy,
+                'one_pass': one_pass,
+                'one_pass_bytes': one_pass_bytes,
+                'speedup': legacy['mean_ms'] / one_pass['mean_ms'] if one_pass['mean_ms'] else 0,
+            })
+
+    return report
+
+
+def print_report(report):
+    """打印基准测试结果"""
+    print(f"\n[📊 页面解析基准测试] seed={report['seed']} iterations={report['iterations']}")
+    for item in report['results']:
+        flag = '✅' if item['consistent'] else '❌ 结果不一致'
+        print(f"[{flag}] {item['case']:<20} {item['size_kb']:>6}KB | "
+              f"原始 {item['legacy']['mean_ms']:>8.2f}ms | 一次扫描 {item['one_pass']['mean_ms']:>8.2f}ms | "
+              f"字节 {item['one_pass_bytes']['mean_ms']:>8.2f}ms | "
+              f"加速比 {item['speedup']:.1f}x | {item['result'][1]}")
+
+    inconsistent = [item for item in report['results'] if not item['consistent']]
+    if inconsistent:
+        print(f"\n[❌ 校验失败] {len(inconsistent)} 个用例结果与原始实现不一致")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='VIP页面解析基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES_KB, help='合成页面大小(KB)')
+    parser.add_argument('--iterations', type=int, default=20, help='每个用例的解析次数')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（确定性模式）')
+    parser.add_argument('--case', action='append', dest='cases', help='只运行指定场景，可多次指定')
+    parser.add_argument('--json', dest='json_path', default=None, help='将结果保存为JSON文件')
+
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        sizes_kb=args.sizes,
+        iterations=args.iterations,
+        seed=args.seed,
+        cases=args.cases
+    )
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n[💾 保存完成] 结果已保存到 {args.json_path}")
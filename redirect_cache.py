@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+短链接重定向持久化缓存
+163cn.tv 短链接的跳转目标固定不变，HEAD结果可以长期缓存在本地SQLite中
+"""
+
+import sqlite3
+import threading
+import time
+
+from link_resolution import normalize_short_url
+
+DEFAULT_CACHE_PATH = 'redirect_cache.db'
+
+
+class RedirectCache:
+    """基于SQLite的短链接重定向缓存（线程安全，超出容量时按最近访问时间淘汰）"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=500000, access_flush_size=1000):
+        self.path = path
+        self.max_entries = max_entries
+        # 每写入这么多条检查一次容量，避免每次写入都执行 COUNT
+        self.evict_check_interval = max(1, max_entries // 100)
+        # 命中时的访问时间先记在内存中，积累到这么多条（或下次写入/淘汰/关闭时）再批量写入
+        self.access_flush_size = max(1, access_flush_size)
+        self._pending_access = {}
+
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts_since_check = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.closed = False
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS redirects (
+                    short_url TEXT PRIMARY KEY,
+                    status_code INTEGER NOT NULL,
+                    location TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            ''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_redirects_accessed ON redirects(accessed_at)')
+            self.conn.commit()
+
+    def get(self, short_url):
+        """查询缓存，命中时返回 (status_code, location)，否则返回None"""
+        # 与请求合并使用相同的规范化键，协议/主机名大小写/末尾斜杠不同的同一短链接共用一条缓存
+        key = normalize_short_url(short_url)
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status_code, location FROM redirects WHERE short_url = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # 读取不触发磁盘写入，访问时间只用于淘汰排序，批量更新即可
+            self._pending_access[key] = time.time()
+            if len(self._pending_access) >= self.access_flush_size:
+                self._flush_access_locked()
+                self.conn.commit()
+            return row[0], row[1]
+
+    def put(self, short_url, status_code, location):
+        """写入缓存（只应写入固定不变的301/302跳转）"""
+        key = normalize_short_url(short_url)
+        now = time.time()
+        with self.lock:
+            self._pending_access.pop(key, None)
+            self._flush_access_locked()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO redirects (short_url, status_code, location, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, status_code, location, now, now)
+            )
+            self.conn.commit()
+
+            self._puts_since_check += 1
+            if self._puts_since_check >= self.evict_check_interval:
+                self._puts_since_check = 0
+                self._evict_locked()
+
+    def _flush_access_locked(self):
+        """写入积累的访问时间（调用方需持有锁并负责提交）"""
+        if not self._pending_access:
+            return
+        self.conn.executemany(
+            'UPDATE redirects SET accessed_at = ? WHERE short_url = ?',
+            [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+        )
+        self._pending_access.clear()
+
+    def _evict_locked(self):
+        """超出容量时淘汰最久未访问的条目（调用方需持有锁）"""
+        size = self.conn.execute('SELECT COUNT(*) FROM redirects').fetchone()[0]
+        if size <= self.max_entries:
+            return
+        # 一次淘汰到容量的90%，避免频繁触发
+        remove_count = size - int(self.max_entries * 0.9)
+        self.conn.execute(
+            'DELETE FROM redirects WHERE short_url IN '
+            '(SELECT short_url FROM redirects ORDER BY accessed_at ASC LIMIT ?)',
+            (remove_count,)
+        )
+        self.conn.commit()
+        self.evictions += remove_count
+
+    def size(self):
+        """当前缓存条目数"""
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM redirects').fetchone()[0]
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'evictions': self.evictions,
+            'size': self.size(),
+            'max_entries': self.max_entries
+        }
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self._pending_access.clear()
+            self.conn.execute('DELETE FROM redirects')
+            self.conn.commit()
+
+    def flush(self):
+        """立即写入积累的访问时间"""
+        with self.lock:
+            self._flush_access_locked()
+            self.conn.commit()
+
+    def close(self):
+        """写入积累的访问时间并关闭数据库连接"""
+        with self.lock:
+            if self.closed:
+                return
+            self._flush_access_locked()
+            self.conn.commit()
+            self.conn.close()
+            self.closed = True
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+礼品卡分析结果缓存
+按礼品卡状态区分缓存策略：
+- expired / claimed 为终态，永久缓存，不再重复查询
+- available 短时间缓存（TTL）
+- api_exception 等失败结果不缓存
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from gift_result import GiftResult
+
+# 终态：状态不会再发生变化
+TERMINAL_GIFT_STATUSES = ('expired', 'claimed')
+
+
+class ResultCache:
+    """内存中的礼品卡结果缓存（线程安全，超出容量时按LRU淘汰）"""
+
+    def __init__(self, available_ttl=300, max_entries=500000):
+        self.available_ttl = available_ttl  # 可领取结果的有效期（秒）
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # short_url -> (result, stored_at, is_terminal)
+        self.hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, result):
+        """判断结果是否可以缓存"""
+        if not result or result.get('status') != 'success':
+            return False
+        return result.get('gift_status') in TERMINAL_GIFT_STATUSES + ('available',)
+
+    def put(self, short_url, result, now=None):
+        """写入缓存，不可缓存的结果会被忽略"""
+        if not self.is_cacheable(result):
+            return False
+
+        now = time.time() if now is None else now
+        is_terminal = result.get('gift_status') in TERMINAL_GIFT_STATUSES
+        # 以紧凑记录存放，读取时再转换回普通dict
+        entry = GiftResult.from_dict(result)
+        entry.pop('from_cache', None)
+
+        with self.lock:
+            self.entries[short_url] = (entry, now, is_terminal)
+            self.entries.move_to_end(short_url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return True
+
+    def get(self, short_url, now=None):
+        """查询缓存，返回结果副本（带 from_cache 标记），未命中或已过期返回None"""
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self.entries.get(short_url)
+            if entry is not None:
+                result, stored_at, is_terminal = entry
+                if is_terminal or now - stored_at < self.available_ttl:
+                    self.entries.move_to_end(short_url)
+                    self.hits += 1
+                    cached = result.to_dict()
+                    cached['from_cache'] = True
+                    return cached
+            self.misses += 1
+            return None
+
+    def peek(self, short_url):
+        """不考虑有效期地读取缓存条目，返回 (结果副本, 写入时间) 或None"""
+        with self.lock:
+            entry = self.entries.get(short_url)
+            if entry is None:
+                return None
+            return entry[0].to_dict(), entry[1]
+
+    def invalidate(self, short_url):
+        """删除指定链接的缓存"""
+        with self.lock:
+            self.entries.pop(short_url, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """命中统计"""
+        with self.lock:
+            terminal = sum(1 for entry in self.entries.values() if entry[2])
+            size = len(self.entries)
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': size,
+            'terminal': terminal
+        }
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+列式分析结果存储
+按列保存结果：状态、礼品类型等字符串做字典编码存为小整数，价格、过期时间存为数值数组。
+统计计数、价值汇总和按状态划分链接都在整列上一次完成，百万条结果也只需毫秒级。
+安装了 numpy 时使用向量化运算，否则退回纯Python实现（结果相同，只是较慢）。
+"""
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 字典编码的列：列名 -> (缺省值, array类型码)；编码用32位整数，取值种类再多也不会溢出
+CATEGORY_COLUMNS = {
+    'status': ('unknown', 'i'),
+    'gift_status': ('unknown', 'i'),
+    'gift_type': ('Unknown', 'i'),
+    'error_category': ('unknown', 'i'),
+    'vip_status': ('unknown', 'i'),
+    'vip_method': ('unknown', 'i'),
+}
+
+# 数值列：列名 -> (缺省值, array类型码)
+NUMERIC_COLUMNS = {
+    'gift_price': (0, 'd'),
+    'expire_time': (0, 'q'),
+    'is_vip_link': (False, 'b'),
+}
+
+# 预先登记的状态编码，保证常见状态的编码固定
+KNOWN_STATUSES = ('success', 'api_exception', 'system_exception', 'invalid', 'error')
+
+
+class _Categories:
+    """字符串字典：值 <-> 编码，编码按首次出现的顺序分配"""
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class ResultStore:
+    """列式结果存储
+
+    按条件筛选得到掩码（numpy 布尔数组，或无 numpy 时的行号集合），
+    掩码之间可以直接用 & 和 | 组合，取反使用 negate()。
+    """
+
+    def __init__(self, results=None):
+        self.clear()
+        if results:
+            self.extend(results)
+
+    def clear(self):
+        """清空所有列"""
+        self.rows = []  # 原始结果（仅保存引用）
+        self.short_urls = []
+        self.categories = {name: _Categories() for name in CATEGORY_COLUMNS}
+        self.categories['status'] = _Categories(KNOWN_STATUSES)
+        self.columns = {name: array(typecode) for name, (_, typecode) in CATEGORY_COLUMNS.items()}
+        self.columns.update({name: array(typecode) for name, (_, typecode) in NUMERIC_COLUMNS.items()})
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, result):
+        """追加一条结果"""
+        self.append_many((result,))
+
+    def extend(self, results):
+        """批量追加结果"""
+        self.append_many(results)
+
+    def append_many(self, results):
+        """逐列编码并追加结果"""
+        get_column = self.columns.__getitem__
+        encoders = [
+            (name, default, get_column(name).append, self.categories[name].encode)
+            for name, (default, _) in CATEGORY_COLUMNS.items() if name != 'vip_method'
+        ]
+        append_method = get_column('vip_method').append
+        encode_method = self.categories['vip_method'].encode
+        append_price = get_column('gift_price').append
+        append_expire = get_column('expire_time').append
+        append_vip = get_column('is_vip_link').append
+        append_row = self.rows.append
+        append_url = self.short_urls.append
+
+        for result in results:
+            get = result.get
+            append_row(result)
+            append_url(get('short_url', ''))
+            for name, default, append, encode in encoders:
+                append(encode(get(name, default)))
+            append_method(encode_method((get('vip_expiry_check') or {}).get('method', 'unknown')))
+            append_price(float(get('gift_price') or 0))
+            append_expire(int(get('expire_time') or 0))
+            append_vip(1 if get('is_vip_link', False) else 0)
+
+    def _array(self, name):
+        """列的 numpy 视图（不复制数据；仅在单次计算中使用，不要长期持有）"""
+        column = self.columns[name]
+        # array 与 numpy 的类型码含义相同（b/i/q/d）
+        return np.frombuffer(column, dtype=np.dtype(column.typecode), count=len(column))
+
+    def all_rows(self):
+        """选中全部行的掩码"""
+        if np is not None:
+            return np.ones(len(self.rows), dtype=bool)
+        return set(range(len(self.rows)))
+
+    def negate(self, mask):
+        """掩码取反"""
+        if np is not None:
+            return ~mask
+        return set(range(len(self.rows))) - mask
+
+    def where(self, column, *values):
+        """返回列值属于 values 的行的掩码"""
+        if column in CATEGORY_COLUMNS:
+            codes_map = self.categories[column].codes
+            targets = [codes_map[value] for value in values if value in codes_map]
+        else:
+            targets = [int(value) for value in values]
+
+        if np is not None:
+            data = self._array(column)
+            if not targets:
+                return np.zeros(len(data), dtype=bool)
+            if len(targets) == 1:
+                return data == targets[0]
+            return np.isin(data, targets)
+
+        targets = set(targets)
+        return {i for i, value in enumerate(self.columns[column]) if value in targets}
+
+    def count(self, mask=None):
+        """掩码选中的行数"""
+        if mask is None:
+            return len(self.rows)
+        if np is not None:
+            return int(np.count_nonzero(mask))
+        return len(mask)
+
+    def value_counts(self, column, mask=None):
+        """字典编码列的取值计数，按值首次出现的顺序返回 {值: 数量}"""
+        values = self.categories[column].values
+        if np is not None:
+            data = self._array(column)
+            if mask is not None:
+                data = data[mask]
+            counts = np.bincount(data, minlength=len(values))
+            return {values[code]: int(count) for code, count in enumerate(counts) if count}
+
+        counts = [0] * len(values)
+        data = self.columns[column]
+        for i in (range(len(data)) if mask is None else mask):
+            counts[data[i]] += 1
+        return {values[code]: count for code, count in enumerate(counts) if count}
+
+    def sum(self, column, mask=None):
+        """数值列求和"""
+        if np is not None:
+            data = self._array(column)
+            if mask is not None:
+                data = data[mask]
+            return float(data.sum())
+
+        data = self.columns[column]
+        if mask is None:
+            return float(sum(data))
+        return float(sum(data[i] for i in mask))
+
+    def _indices(self, mask):
+        """掩码选中的行号（按原始顺序）"""
+        if mask is None:
+            return range(len(self.rows))
+        if np is not None:
+            return np.flatnonzero(mask).tolist()
+        return sorted(mask)
+
+    def select(self, column, mask=None):
+        """按原始顺序取出选中行的某列值（字典编码列返回原字符串）"""
+        indices = self._indices(mask)
+        if column == 'short_url':
+            urls = self.short_urls
+            return [urls[i] for i in indices]
+        data = self.columns[column]
+        if column in CATEGORY_COLUMNS:
+            values = self.categories[column].values
+            return [values[data[i]] for i in indices]
+        return [data[i] for i in indices]
+
+    def take(self, mask=None):
+        """按原始顺序取出选中行的原始结果"""
+        rows = self.rows
+        return [rows[i] for i in self._indices(mask)]
+
+
+class ResultList(list):
+    """记录修改版本的结果列表
+
+    追加（append/extend）不改变版本，可由 ResultStore 增量同步；
+    替换、删除、插入、排序等会改变已有行的操作使版本加一，提示需要重建列式存储。
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        self._changed()
+        return result
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._changed()
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        super().remove(value)
+        self._changed()
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        super().reverse()
+        self._changed()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+结果序列化
+JSON 依次优先使用 orjson、ujson，都未安装时退回标准库 json；输出格式保持一致
+（缩进2空格、中文不转义）。另外支持 msgpack 二进制格式（需安装 msgpack），
+体积更小、读写更快，适合程序之间传递结果。
+"""
+
+import json
+from collections.abc import Mapping
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+    JSONDecodeError = orjson.JSONDecodeError
+elif ujson is not None:
+    JSON_BACKEND = 'ujson'
+    JSONDecodeError = getattr(ujson, 'JSONDecodeError', ValueError)
+else:
+    JSON_BACKEND = 'json'
+    JSONDecodeError = json.JSONDecodeError
+
+MSGPACK_AVAILABLE = msgpack is not None
+
+# 按文件扩展名识别的 msgpack 格式
+MSGPACK_EXTENSIONS = ('.msgpack', '.mpk')
+
+
+def _default(obj):
+    """序列化非内置类型：结果记录（GiftResult 等映射类型）转换为dict"""
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"无法序列化 {type(obj).__name__} 类型的对象")
+
+
+def json_dumps(obj, pretty=False):
+    """序列化为JSON字节串（UTF-8）"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if ujson is not None:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False,
+                           indent=2 if pretty else 0, default=_default).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, indent=2 if pretty else None, default=_default).encode('utf-8')
+
+
+def json_loads(data):
+    """解析JSON（str 或 bytes），格式错误时抛出 JSONDecodeError"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+    return json.loads(data)
+
+
+def msgpack_dumps(obj):
+    """序列化为 msgpack 字节串"""
+    if msgpack is None:
+        raise RuntimeError("未安装 msgpack，无法使用二进制结果格式")
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def msgpack_loads(data):
+    """解析 msgpack 字节串"""
+    if msgpack is None:
+        raise RuntimeError("未安装 msgpack，无法使用二进制结果格式")
+    return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+def detect_format(path):
+    """根据扩展名判断结果文件格式：'msgpack' 或 'json'"""
+    return 'msgpack' if str(path).lower().endswith(MSGPACK_EXTENSIONS) else 'json'
+
+
+def save_results(results, path, format=None):
+    """保存结果文件，format 缺省时按扩展名判断"""
+    format = format or detect_format(path)
+    if format == 'msgpack':
+        data = msgpack_dumps(results)
+    else:
+        data = json_dumps(results, pretty=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def load_results(path, format=None):
+    """读取结果文件，format 缺省时按扩展名判断"""
+    format = format or detect_format(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    if format == 'msgpack':
+        return msgpack_loads(data)
+    return json_loads(data)
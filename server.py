@@ -5,10 +5,11 @@
 提供HTTP API接口，支持跨域请求
 """
 
-import json
 import time
 import asyncio
 import aiohttp
+import atexit
+import threading
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import logging
@@ -21,12 +22,21 @@ import os
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from link_resolution import LinkResolution, normalize_short_url
+from redirect_cache import RedirectCache
+from result_cache import ResultCache
+from flow_control import HostRateLimiter, RetryPolicy, AsyncSingleFlight
+from page_scan import (EXPIRE_STOP_PATTERN, GIFT_STATUS_MATCHER, read_until_async, decode_body,
+                       extract_expire_field, find_state_value)
+
 # 导入原有的分析器
 try:
     from optimal_gift_analyzer import OptimalGiftAnalyzer
+    from async_gift_analyzer import AsyncGiftAnalyzer
 except ImportError:
     print("警告: 无法导入 optimal_gift_analyzer，将使用简化版分析器")
     OptimalGiftAnalyzer = None
+    AsyncGiftAnalyzer = None
 
 app = Flask(__name__)
 CORS(app)  # 启用跨域支持
@@ -35,20 +45,95 @@ CORS(app)  # 启用跨域支持
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class AsyncLoopThread:
+    """常驻后台线程的事件循环
+
+    所有异步任务都提交到同一个循环上执行，aiohttp会话及其连接池
+    始终绑定在这个循环上，可以在请求之间复用连接。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """启动事件循环线程（幂等）"""
+        with self.lock:
+            if self.loop and self.thread and self.thread.is_alive():
+                return self.loop
+
+            ready = threading.Event()
+            self.loop = asyncio.new_event_loop()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                ready.set()
+                self.loop.run_forever()
+
+            self.thread = threading.Thread(target=run_loop, name='AsyncLoopThread', daemon=True)
+            self.thread.start()
+            ready.wait()
+            return self.loop
+
+    def run(self, coro, timeout=None):
+        """在常驻循环上执行协程并同步等待结果"""
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout)
+
+    def stop(self):
+        """停止事件循环线程"""
+        with self.lock:
+            if not self.loop:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            if self.thread:
+                self.thread.join(timeout=5)
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+
+# 全局事件循环，所有请求共享
+loop_thread = AsyncLoopThread()
+
+def run_async(coro, timeout=None):
+    """在全局事件循环上运行协程"""
+    return loop_thread.run(coro, timeout)
+
 class WebAnalyzer:
     """Web版本的分析器"""
     
     def __init__(self):
         self.session = None
+        self.redirect_cache = RedirectCache()
+        self.result_cache = ResultCache()
+        # 按礼品卡身份缓存的结果，别名短链接直接复用（与按短链接的结果缓存分开统计和淘汰）
+        self.gift_cache = ResultCache()
+        # 所有请求共享的按主机限速器
+        self.rate_limiter = HostRateLimiter()
+        # 合并所有请求中同一短链接的并发分析（所有协程运行在同一事件循环上）
+        self.single_flight = AsyncSingleFlight()
+        # 指向同一VIP邀请(token)的不同短链接合并为一次检查
+        self.vip_flight = AsyncSingleFlight()
         self.original_analyzer = None
+        self.gift_analyzer = None
         if OptimalGiftAnalyzer:
-            self.original_analyzer = OptimalGiftAnalyzer()
+            self.original_analyzer = OptimalGiftAnalyzer(
+                key_pool_size=32, redirect_cache=self.redirect_cache, result_cache=self.result_cache,
+                rate_limiter=self.rate_limiter, retry_policy=RetryPolicy(), gift_cache=self.gift_cache
+            )
+            # 异步礼品卡分析器，与Web分析器共享会话，不阻塞事件循环
+            self.gift_analyzer = AsyncGiftAnalyzer(analyzer=self.original_analyzer)
     
     async def create_session(self):
-        """创建异步HTTP会话"""
-        if not self.session:
+        """创建异步HTTP会话（全局共享连接池）"""
+        if not self.session or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=15)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+            if self.gift_analyzer:
+                self.gift_analyzer.use_session(self.session)
         return self.session
     
     async def close_session(self):
@@ -57,6 +142,10 @@ class WebAnalyzer:
             await self.session.close()
             self.session = None
     
+    async def throttle(self, url):
+        """按目标主机限速"""
+        await self.rate_limiter.acquire_async(url)
+    
     def to_beijing_time(self, timestamp_ms):
         """将毫秒时间戳转换为北京时间字符串"""
         try:
@@ -66,23 +155,41 @@ class WebAnalyzer:
         except:
             return '时间转换失败'
     
-    async def get_redirect_url(self, url):
-        """获取重定向URL"""
+    async def resolve_short_link(self, url):
+        """解析短链接重定向，返回 LinkResolution（优先查询重定向缓存）"""
+        # SQLite 是同步调用，放到线程池中执行，避免阻塞事件循环
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.redirect_cache.get, url)
+        if cached:
+            return LinkResolution(url, *cached)
+
         try:
             session = await self.create_session()
+            await self.throttle(url)
             async with session.head(url, allow_redirects=False) as response:
-                if response.status in [301, 302, 303, 307, 308]:
-                    return response.headers.get('Location', url)
-                return url
+                resolution = LinkResolution(url, response.status, response.headers.get('Location'))
         except Exception as e:
             logger.error(f"获取重定向URL失败: {e}")
-            return url
+            return LinkResolution(url, error=e)
+
+        # 只缓存固定跳转
+        if resolution.status_code in [301, 302] and resolution.location:
+            await loop.run_in_executor(
+                None, self.redirect_cache.put, url, resolution.status_code, resolution.location
+            )
+        return resolution
+    
+    async def get_redirect_url(self, url):
+        """获取重定向URL"""
+        resolution = await self.resolve_short_link(url)
+        return resolution.redirect_url or url
     
-    async def check_vip_link(self, link):
-        """检查VIP链接"""
+    async def check_vip_link(self, link, redirect_url=None):
+        """检查VIP链接，已解析过重定向时可直接传入 redirect_url"""
         try:
             # 获取重定向URL
-            redirect_url = await self.get_redirect_url(link)
+            if redirect_url is None:
+                redirect_url = await self.get_redirect_url(link)
             
             if 'vip-invite-cashier' not in redirect_url:
                 return {
@@ -95,32 +202,23 @@ class WebAnalyzer:
             
             # 获取页面内容
             session = await self.create_session()
+            await self.throttle(redirect_url)
             async with session.get(redirect_url) as response:
                 if response.status != 200:
                     raise Exception(f"HTTP {response.status}: {response.reason}")
                 
-                html = await response.text()
+                # 流式读取，找到过期时间后立即断开；直接匹配原始字节，只解码标题
+                html, _ = await read_until_async(response, EXPIRE_STOP_PATTERN)
                 
                 # 解析过期时间
-                expire_patterns = [
-                    r'expireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
-                    r'"expireTime"\s*:\s*(\d{13})',
-                    r'tokenExpireTime["\']?\s*[=:]\s*["\']?(\d{13})["\']?',
-                ]
-                
-                expire_time = None
-                for pattern in expire_patterns:
-                    match = re.search(pattern, html)
-                    if match:
-                        expire_time = int(match.group(1))
-                        break
+                expire_time = extract_expire_field(html)
                 
                 current_time = int(time.time() * 1000)
                 is_valid = expire_time and expire_time > current_time
                 
                 # 解析标题
-                title_match = re.search(r'<title>(.*?)</title>', html)
-                title = title_match.group(1) if title_match else 'VIP邀请'
+                title_match = re.search(rb'<title>(.*?)</title>', html)
+                title = decode_body(title_match.group(1), response.charset) if title_match else 'VIP邀请'
                 
                 return {
                     'short_url': link,
@@ -149,13 +247,14 @@ class WebAnalyzer:
                 'timestamp': int(time.time() * 1000)
             }
     
-    async def check_gift_link(self, link):
-        """检查礼品卡链接"""
+    async def check_gift_link(self, link, resolution=None):
+        """检查礼品卡链接，已解析过重定向时可直接传入 resolution"""
         try:
-            # 如果有原始分析器，优先使用
-            if self.original_analyzer:
+            # 如果有原始分析器，优先使用（异步实现，不阻塞事件循环）
+            if self.gift_analyzer:
                 try:
-                    result = self.original_analyzer.analyze_gift_link(link)
+                    await self.create_session()
+                    result = await self.gift_analyzer.analyze_gift_link(link, resolution=resolution)
                     if result.get('status') == 'success':
                         return result
                 except Exception as e:
@@ -170,50 +269,31 @@ class WebAnalyzer:
             
             # 尝试直接访问链接获取页面内容
             session = await self.create_session()
+            await self.throttle(link)
             async with session.get(link) as response:
                 if response.status != 200:
                     raise Exception(f"HTTP {response.status}: {response.reason}")
                 
-                html = await response.text()
-                
-                # 检查页面状态指示器
-                status_indicators = {
-                    '礼品卡不存在': 'invalid',
-                    '链接已失效': 'invalid',
-                    '已过期': 'expired',
-                    '已领取完': 'claimed',
-                    '礼品卡已被领完': 'claimed',
-                    '活动已结束': 'expired'
-                }
-                
-                for indicator, status in status_indicators.items():
-                    if indicator in html:
-                        return {
-                            'short_url': link,
-                            'status': 'success',
-                            'gift_status': status,
-                            'status_text': indicator,
-                            'gift_type': '未知礼品',
-                            'timestamp': int(time.time() * 1000)
-                        }
+                # 直接读取原始字节，不做字符集探测和整页解码
+                html = await response.read()
                 
-                # 尝试解析JSON数据
-                json_patterns = [
-                    r'window\.__INITIAL_STATE__\s*=\s*({.+?});',
-                    r'window\.INITIAL_STATE\s*=\s*({.+?});',
-                    r'__NUXT__\s*=\s*({.+?});'
-                ]
+                # 检查页面状态指示器（一次扫描找出全部提示，按原有顺序取第一个）
+                found = GIFT_STATUS_MATCHER.first(html)
+                if found:
+                    indicator, status = found
+                    return {
+                        'short_url': link,
+                        'status': 'success',
+                        'gift_status': status,
+                        'status_text': indicator,
+                        'gift_type': '未知礼品',
+                        'timestamp': int(time.time() * 1000)
+                    }
                 
-                for pattern in json_patterns:
-                    match = re.search(pattern, html, re.DOTALL)
-                    if match:
-                        try:
-                            json_data = json.loads(match.group(1))
-                            gift_data = self.extract_gift_data(json_data)
-                            if gift_data:
-                                return self.parse_gift_data(gift_data, link)
-                        except json.JSONDecodeError:
-                            continue
+                # 在页面内嵌的状态对象中线性查找礼品数据，只解析命中的部分
+                gift_data = find_state_value(html)
+                if gift_data:
+                    return self.parse_gift_data(gift_data, link)
                 
                 # 如果没有找到明确的状态，默认返回可能可用
                 return {
@@ -235,24 +315,6 @@ class WebAnalyzer:
                 'timestamp': int(time.time() * 1000)
             }
     
-    def extract_gift_data(self, json_data):
-        """从JSON数据中提取礼品信息"""
-        # 递归查找礼品数据
-        if isinstance(json_data, dict):
-            for key, value in json_data.items():
-                if key in ['gift', 'giftInfo', 'linkCard', 'card']:
-                    return value
-                elif isinstance(value, (dict, list)):
-                    result = self.extract_gift_data(value)
-                    if result:
-                        return result
-        elif isinstance(json_data, list):
-            for item in json_data:
-                result = self.extract_gift_data(item)
-                if result:
-                    return result
-        return None
-    
     def parse_gift_data(self, gift_data, link):
         """解析礼品数据"""
         try:
@@ -293,16 +355,35 @@ class WebAnalyzer:
         except Exception as e:
             raise Exception(f'数据解析失败: {str(e)}')
     
+    async def check_vip_link_deduped(self, link, redirect_url):
+        """按token检查VIP链接，同一邀请正在检查时直接共享其结果"""
+        token = parse_qs(urlparse(redirect_url).query).get('token', [None])[0]
+        if not token:
+            return await self.check_vip_link(link, redirect_url=redirect_url)
+
+        result, _ = await self.vip_flight.do(token, self.check_vip_link, link, redirect_url=redirect_url)
+        result = dict(result)
+        result['short_url'] = link
+        return result
+
     async def analyze_single_link(self, link):
-        """分析单个链接"""
+        """分析单个链接，同一链接正在分析时直接等待并共享其结果"""
+        result, _ = await self.single_flight.do(normalize_short_url(link), self.fetch_single_link, link)
+        result = dict(result)
+        result['short_url'] = link
+        return result
+
+    async def fetch_single_link(self, link):
+        """分析单个链接（不合并并发请求）"""
         try:
-            # 检查链接类型
-            redirect_url = await self.get_redirect_url(link)
+            # 检查链接类型（只解析一次重定向，结果传给后续检测）
+            resolution = await self.resolve_short_link(link)
+            redirect_url = resolution.redirect_url or link
             
             if 'vip-invite-cashier' in redirect_url:
-                return await self.check_vip_link(link)
+                return await self.check_vip_link_deduped(link, redirect_url)
             elif '163cn.tv' in link:
-                return await self.check_gift_link(link)
+                return await self.check_gift_link(link, resolution=resolution)
             else:
                 return {
                     'short_url': link,
@@ -324,13 +405,27 @@ class WebAnalyzer:
 # 创建全局分析器实例
 analyzer = WebAnalyzer()
 
+@atexit.register
+def shutdown_async_resources():
+    """进程退出时关闭共享会话和事件循环"""
+    if loop_thread.loop:
+        try:
+            run_async(analyzer.close_session(), timeout=5)
+        except Exception as e:
+            logger.warning(f"关闭HTTP会话失败: {e}")
+        loop_thread.stop()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
     return jsonify({
         'status': 'healthy',
         'timestamp': int(time.time() * 1000),
-        'analyzer_available': OptimalGiftAnalyzer is not None
+        'analyzer_available': OptimalGiftAnalyzer is not None,
+        'redirect_cache': analyzer.redirect_cache.stats(),
+        'result_cache': analyzer.result_cache.stats(),
+        'gift_cache': analyzer.gift_cache.stats(),
+        'coalesced_requests': analyzer.single_flight.shared_count
     })
 
 @app.route('/api/analyze', methods=['POST'])
@@ -349,14 +444,9 @@ def analyze_link():
                 'error': '链接不能为空'
             }), 400
         
-        # 使用asyncio运行异步函数
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            result = loop.run_until_complete(analyzer.analyze_single_link(link))
-            return jsonify(result)
-        finally:
-            loop.close()
+        # 在共享事件循环上运行异步函数
+        result = run_async(analyzer.analyze_single_link(link))
+        return jsonify(result)
             
     except Exception as e:
         logger.error(f"分析接口错误: {e}")
@@ -414,18 +504,13 @@ def batch_analyze():
             
             return processed_results
         
-        # 运行批量分析
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            results = loop.run_until_complete(batch_process())
-            return jsonify({
-                'results': results,
-                'total': len(results),
-                'timestamp': int(time.time() * 1000)
-            })
-        finally:
-            loop.close()
+        # 在共享事件循环上运行批量分析
+        results = run_async(batch_process())
+        return jsonify({
+            'results': results,
+            'total': len(results),
+            'timestamp': int(time.time() * 1000)
+        })
             
     except Exception as e:
         logger.error(f"批量分析接口错误: {e}")
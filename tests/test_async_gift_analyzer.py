@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""AsyncGiftAnalyzer.batch_analyze 测试"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from async_gift_analyzer import AsyncGiftAnalyzer
+from flow_control import RetryPolicy
+from link_resolution import LinkResolution
+
+
+class FakeAnalyzer(AsyncGiftAnalyzer):
+    """不发起网络请求，直接返回结果"""
+
+    async def analyze_gift_link(self, short_url):
+        await asyncio.sleep(0)
+        return {'status': 'success', 'short_url': short_url}
+
+
+def run(coro, timeout=5):
+    return asyncio.run(asyncio.wait_for(coro, timeout))
+
+
+def test_batch_analyze_returns_every_result():
+    async def main():
+        async with FakeAnalyzer(max_concurrency=3) as analyzer:
+            return await analyzer.analyze_links(f'u{i}' for i in range(50))
+
+    results = run(main())
+    assert sorted(r['short_url'] for r in results) == sorted(f'u{i}' for i in range(50))
+
+
+def test_batch_analyze_early_break_does_not_hang():
+    async def main():
+        async with FakeAnalyzer(max_concurrency=2) as analyzer:
+            seen = []
+            async for result in analyzer.batch_analyze(f'u{i}' for i in range(1000)):
+                seen.append(result)
+                # 等待worker把有界队列填满后再停止读取
+                await asyncio.sleep(0.05)
+                break
+            return seen
+
+    assert len(run(main())) == 1
+
+
+def test_batch_analyze_aclose_does_not_hang():
+    async def main():
+        async with FakeAnalyzer(max_concurrency=2) as analyzer:
+            gen = analyzer.batch_analyze(f'u{i}' for i in range(1000))
+            first = await gen.__anext__()
+            await asyncio.sleep(0.05)
+            await gen.aclose()
+            return first
+
+    assert run(main())['status'] == 'success'
+
+
+class FlakyAsyncAnalyzer(AsyncGiftAnalyzer):
+    """按顺序返回预设结果，记录单次尝试的次数"""
+
+    def __init__(self, outcomes, **kwargs):
+        super().__init__(**kwargs)
+        self.outcomes = list(outcomes)
+        self.attempts = 0
+
+    async def fetch_gift_link_once(self, short_url, resolution=None):
+        self.attempts += 1
+        return dict(self.outcomes.pop(0))
+
+
+def test_async_retry_records_count_and_respects_cap():
+    transient = {'status': 'api_exception', 'error_category': 'rate_limit', 'retry_after': 0.01}
+    resolution = LinkResolution('https://163cn.tv/a', 302, 'https://y.music.163.com/g/gift-receive?d=D1')
+
+    async def main():
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.05)
+        analyzer = FlakyAsyncAnalyzer([transient, {'status': 'success'}], retry_policy=policy)
+        success = await analyzer.fetch_gift_link('https://163cn.tv/a', resolution)
+        capped = FlakyAsyncAnalyzer([transient] * 5, retry_policy=policy)
+        failure = await capped.fetch_gift_link('https://163cn.tv/a', resolution)
+        return analyzer.attempts, success, capped.attempts, failure
+
+    attempts, success, capped_attempts, failure = run(main())
+    assert attempts == 2
+    assert success['retry_count'] == 1
+    assert success['retry_backoff'] >= 0.01
+    assert capped_attempts == 3
+    assert failure['retry_count'] == 2
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""flow_control 流量控制工具测试"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from flow_control import (AdaptiveConcurrencyController, AsyncSingleFlight, CircuitBreaker, EndpointSelector,
+                          RetryBudget, RetryPolicy, SingleFlight, parse_retry_after)
+
+
+def test_cache_hits_do_not_skew_latency_baseline():
+    controller = AdaptiveConcurrencyController(initial_limit=5, max_limit=50)
+    for _ in range(50):
+        controller.acquire()
+        controller.release({'status': 'success', 'from_cache': True}, 0.0001)
+    assert controller.latency_baseline is None
+    assert controller.current_limit == 5
+
+    # 真实请求延迟稳定时并发上限继续增长
+    for _ in range(50):
+        controller.acquire()
+        controller.release({'status': 'success'}, 0.2)
+    assert controller.latency_baseline > 0.1
+    assert controller.current_limit > 5
+
+
+def test_congestion_reduces_limit():
+    controller = AdaptiveConcurrencyController(initial_limit=20, decrease_cooldown=0)
+    controller.acquire()
+    controller.release({'status': 'api_exception', 'error_category': 'rate_limit'}, 0.1)
+    assert controller.current_limit == 10
+    assert controller.congestion_events == 1
+
+
+def test_circuit_breaker_half_open_allows_single_probe():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.2)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.25)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_endpoint_candidates_do_not_consume_probe_slots():
+    selector = EndpointSelector(['a', 'b'], failure_threshold=1, cooldown=0.2)
+    selector.record_failure('a')
+    selector.record_failure('b')
+    time.sleep(0.25)
+
+    # 多次取候选列表不改变熔断状态
+    assert selector.candidates() == ['a', 'b']
+    assert selector.candidates() == ['a', 'b']
+    assert selector.breakers['b'].state == CircuitBreaker.OPEN
+
+    # 只尝试第一个接口并成功，第二个接口的探测名额仍然保留
+    assert selector.allow('a')
+    selector.record_success('a')
+    assert selector.candidates() == ['a', 'b']
+    assert selector.allow('b')
+    assert not selector.allow('b')
+
+
+def test_endpoint_selector_prefers_last_success():
+    selector = EndpointSelector(['a', 'b', 'c'])
+    selector.record_success('c')
+    assert selector.candidates() == ['c', 'a', 'b']
+    selector.record_failure('c')
+    assert selector.candidates() == ['a', 'b', 'c']
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return key.upper()
+
+    results = []
+
+    def worker():
+        results.append(flight.do('a', fetch, 'a'))
+
+    leader = threading.Thread(target=worker)
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    while flight.shared_count < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert calls == ['a']
+    assert sorted(results) == [('A', False)] + [('A', True)] * 5
+    # 调用结束后不再共享，下一次重新执行
+    assert flight.do('a', lambda: 'again') == ('again', False)
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('a', fail)
+    assert flight.calls == {}
+
+
+def test_async_single_flight_survives_cancelled_caller():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'ok'
+
+        first = asyncio.ensure_future(flight.do('a', fetch))
+        second = asyncio.ensure_future(flight.do('a', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        await asyncio.sleep(0)
+        return calls, result, flight.tasks
+
+    calls, result, tasks = asyncio.run(scenario())
+    assert calls == [1]
+    assert result == ('ok', True)
+    assert tasks == {}
+
+
+TRANSIENT = {'status': 'api_exception', 'error_category': 'timeout'}
+
+
+def test_retry_budget_limits_retries_to_ratio_of_requests():
+    budget = RetryBudget(ratio=0.1, min_retries=2)
+    for _ in range(10):
+        budget.record_request()
+    # 10 * 0.1 + 2 = 3 次重试
+    assert [budget.try_spend() for _ in range(5)] == [True, True, True, False, False]
+    assert budget.stats() == {'requests': 10, 'retries': 3, 'rejected': 2}
+
+
+def test_retry_policy_caps_attempts_and_skips_permanent_errors():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(TRANSIENT, 1)
+    assert policy.should_retry(TRANSIENT, 2)
+    assert not policy.should_retry(TRANSIENT, 3)
+    assert not policy.should_retry({'status': 'api_exception', 'error_category': 'http_error'}, 1)
+    assert not policy.should_retry({'status': 'success'}, 1)
+
+
+def test_retry_policy_stops_when_budget_is_exhausted():
+    policy = RetryPolicy(max_attempts=10, budget=RetryBudget(ratio=0, min_retries=1))
+    assert policy.should_retry(TRANSIENT, 1)
+    assert not policy.should_retry(TRANSIENT, 2)
+    assert policy.budget.stats()['rejected'] == 1
+
+
+def test_backoff_is_floored_by_retry_after_and_capped_by_max_delay():
+    policy = RetryPolicy(base_delay=0.01, max_delay=5.0)
+    for attempt in range(1, 6):
+        assert 0 <= policy.backoff(attempt) <= min(5.0, 0.01 * 2 ** (attempt - 1))
+        assert 3.0 <= policy.backoff(attempt, retry_after=3) <= 5.0
+    assert policy.backoff(1, retry_after=60) == 5.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('Thu, 01 Jan 1970 00:00:00 GMT') == 0.0
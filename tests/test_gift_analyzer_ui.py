@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""gift_analyzer_ui 分析线程测试（无界面）"""
+
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt6')
+
+import gift_analyzer_ui
+from redirect_cache import RedirectCache
+
+VIP_URL = 'https://y.music.163.com/g/vip-invite-cashier/activity1'
+FUTURE = 4102444800000  # 2100-01-01
+
+
+class FakeStreamResponse:
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def thread(tmp_path):
+    cache = RedirectCache(str(tmp_path / 'cache.db'))
+    yield gift_analyzer_ui.AnalyzerThread([], redirect_cache=cache)
+    cache.close()
+
+
+def check_page(thread, monkeypatch, body):
+    monkeypatch.setattr(gift_analyzer_ui.requests, 'get', lambda *args, **kwargs: FakeStreamResponse(body))
+    return thread.check_vip_expiry(VIP_URL)
+
+
+def test_lower_priority_expire_field_does_not_stop_read(thread, monkeypatch):
+    body = b'{"expire_time":1111111111111}' + b' ' * 20 * 1024 + b'{"expireTime":%d}' % FUTURE
+    result = check_page(thread, monkeypatch, body)
+    assert result['expire_time'] == FUTURE
+    assert result['is_valid']
+
+
+def test_status_word_before_expire_time_does_not_stop_read(thread, monkeypatch):
+    body = '<span>已领取</span>'.encode('utf-8') + b' ' * 20 * 1024 + b'{"expireTime":%d}' % FUTURE
+    result = check_page(thread, monkeypatch, body)
+    assert result['expire_time'] == FUTURE
+    assert result['is_valid']
+    assert result['error'] is None
+
+
+def test_status_word_used_when_no_expire_time(thread, monkeypatch):
+    result = check_page(thread, monkeypatch, '<span>已领取</span>'.encode('utf-8'))
+    assert not result['is_valid']
+    assert 'claimed' in result['error']
+
+
+class FakeApiResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self.content = json.dumps(data).encode('utf-8')
+
+
+def check_api(thread, monkeypatch):
+    detail = {'expireTime': FUTURE, 'inviter': {'nickname': '小明'}, 'inviterTotalDays': 7,
+              'activityId': 42, 'payload': 'x' * 1000}
+    monkeypatch.setattr(gift_analyzer_ui.requests, 'get',
+                        lambda *args, **kwargs: FakeApiResponse({'data': detail}))
+    return thread.check_vip_api({'token': 't'})
+
+
+def test_vip_api_keeps_only_summary_by_default(thread, monkeypatch):
+    result = check_api(thread, monkeypatch)
+    assert result['expire_time'] == FUTURE
+    assert result['inviter_name'] == '小明'
+    assert result['total_days'] == 7
+    assert result['activity_id'] == 42
+    assert 'api_data' not in result
+
+
+def test_vip_api_keeps_payload_when_requested(thread, monkeypatch):
+    thread.analyzer.keep_api_response = True
+    result = check_api(thread, monkeypatch)
+    assert result['api_data']['payload'] == 'x' * 1000
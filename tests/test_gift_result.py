@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""gift_result 紧凑结果记录测试"""
+
+import pytest
+
+from gift_result import GiftResult
+
+
+def test_behaves_like_dict():
+    data = {'status': 'success', 'gift_price': 15.0, 'custom': [1]}
+    record = GiftResult(data)
+    assert record == data
+    assert len(record) == 3
+    assert 'custom' in record and 'status' in record and 'message' not in record
+    assert record.get('message', 'none') == 'none'
+    assert record.to_dict() == data
+
+    del record['custom']
+    del record['status']
+    assert record.to_dict() == {'gift_price': 15.0}
+    with pytest.raises(KeyError):
+        del record['status']
+    with pytest.raises(KeyError):
+        record['missing']
+
+
+def test_none_values_are_kept():
+    record = GiftResult(expire_time=None)
+    assert 'expire_time' in record
+    assert record['expire_time'] is None
+
+
+def test_copy_is_independent():
+    record = GiftResult({'status': 'success', 'custom': 1})
+    duplicate = GiftResult.from_dict(record)
+    duplicate['status'] = 'error'
+    duplicate['custom'] = 2
+    assert record.to_dict() == {'status': 'success', 'custom': 1}
+
+
+def test_repeated_strings_are_shared():
+    first = GiftResult(gift_type=''.join(['黑胶', 'VIP']))
+    second = GiftResult(gift_type=''.join(['黑胶', 'VIP']))
+    assert first['gift_type'] is second['gift_type']
+
+
+def test_vip_fields_use_slots():
+    record = GiftResult({
+        'status': 'success', 'is_vip_link': True, 'vip_status': 'valid', 'vip_status_text': 'VIP有效',
+        'vip_expiry_check': {'method': 'page'}, 'sender': '小明', 'gift_count': '7天', 'activity_id': 42,
+    })
+    assert record._extra is None
+    assert record['vip_expiry_check'] == {'method': 'page'}
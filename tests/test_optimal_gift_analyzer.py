@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""OptimalGiftAnalyzer 加密密钥池、礼品卡去重、缓存与重试测试"""
+
+import threading
+import time
+
+import pytest
+
+import optimal_gift_analyzer
+from flow_control import HedgePolicy, RetryBudget, RetryPolicy
+from link_resolution import LinkResolution
+from optimal_gift_analyzer import EncSecKeyPool, NetEaseEncryption, OptimalGiftAnalyzer
+from result_cache import ResultCache
+
+GIFT_PARAMS = {'d': 'D1', 'p': 'P1', 'userid': 'U1'}
+
+
+class CountingAnalyzer(OptimalGiftAnalyzer):
+    """不访问网络，记录礼品卡API调用次数"""
+
+    def __init__(self, delay=0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.api_calls = 0
+
+    def call_gift_api(self, gift_params):
+        with self.lock:
+            self.api_calls += 1
+        time.sleep(self.delay)
+        return {
+            'status': 'success',
+            'gift_status': 'expired',
+            'status_text': '已过期',
+            'expire_time': 1,
+            'total_count': 1,
+            'used_count': 0,
+        }
+
+
+def test_gift_results_are_not_cached_by_default():
+    analyzer = CountingAnalyzer()
+    analyzer.call_gift_api_deduped(GIFT_PARAMS)
+    analyzer.call_gift_api_deduped(GIFT_PARAMS)
+    assert analyzer.gift_cache is None
+    assert analyzer.api_calls == 2
+
+
+def test_injected_gift_cache_serves_alias_links():
+    analyzer = CountingAnalyzer(gift_cache=ResultCache())
+    first = analyzer.call_gift_api_deduped(GIFT_PARAMS)
+    second = analyzer.call_gift_api_deduped(dict(GIFT_PARAMS))
+    assert analyzer.api_calls == 1
+    assert first['gift_status'] == second['gift_status'] == 'expired'
+    assert analyzer.gift_cache_hits == 1
+
+
+def test_gift_cache_is_separate_from_result_cache():
+    result_cache = ResultCache()
+    gift_cache = ResultCache()
+    analyzer = CountingAnalyzer(result_cache=result_cache, gift_cache=gift_cache)
+    assert analyzer.result_cache is not analyzer.gift_cache
+
+    for index, short_url in enumerate(['https://163cn.tv/a', 'https://163cn.tv/b']):
+        location = 'https://y.music.163.com/g/gift-receive?d=D1&p=P1&userid=U1&alias=%d' % index
+        resolution = LinkResolution(short_url, 302, location)
+        result = analyzer.fetch_and_cache_gift_link(short_url, resolution)
+        # 别名链接命中礼品卡缓存，但本链接实际发送了HEAD请求，不标记为缓存结果
+        assert 'from_cache' not in result
+
+    assert analyzer.api_calls == 1
+    assert result_cache.stats()['size'] == 2
+    assert gift_cache.stats()['size'] == 1
+
+
+def test_concurrent_aliases_share_one_api_call():
+    analyzer = CountingAnalyzer(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(analyzer.call_gift_api_deduped(GIFT_PARAMS)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert analyzer.api_calls == 1
+    assert len(results) == 5
+
+
+class SlowPostAnalyzer(OptimalGiftAnalyzer):
+    """礼品卡API固定耗时的分析器"""
+
+    def post_gift_api_once(self, encrypted_data):
+        time.sleep(0.06)
+        return encrypted_data
+
+
+def test_hedged_posts_are_not_capped_or_hedged_while_queued():
+    policy = HedgePolicy(min_samples=1, min_delay=0.1, max_hedge_ratio=1.0)
+    policy.record_latency(0.1)
+    analyzer = SlowPostAnalyzer(hedge_policy=policy)
+    analyzer.reserve_hedge_capacity(200)
+
+    threads = [threading.Thread(target=analyzer.post_gift_api, args=(i,)) for i in range(200)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert policy.hedged == 0
+    assert time.monotonic() - start < 1.0
+
+
+TRANSIENT = {'status': 'api_exception', 'error_category': 'server_error', 'retry_after': 2}
+RESOLUTION = LinkResolution('https://163cn.tv/a', 302, 'https://y.music.163.com/g/gift-receive?d=D1')
+
+
+class FlakyAnalyzer(OptimalGiftAnalyzer):
+    """按顺序返回预设结果的分析器，记录单次尝试的次数"""
+
+    def __init__(self, outcomes, **kwargs):
+        super().__init__(**kwargs)
+        self.outcomes = list(outcomes)
+        self.attempts = 0
+
+    def fetch_gift_link_once(self, short_url, resolution=None):
+        self.attempts += 1
+        return dict(self.outcomes.pop(0))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试等待时间，不实际等待"""
+    delays = []
+    monkeypatch.setattr(optimal_gift_analyzer.time, 'sleep', delays.append)
+    return delays
+
+
+def test_retry_until_success_records_count_and_backoff(sleeps):
+    policy = RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=5.0)
+    analyzer = FlakyAnalyzer([TRANSIENT, TRANSIENT, {'status': 'success'}], retry_policy=policy)
+    result = analyzer.fetch_gift_link('https://163cn.tv/a', RESOLUTION)
+    assert result['status'] == 'success'
+    assert analyzer.attempts == 3
+    assert result['retry_count'] == 2
+    # Retry-After: 2 作为等待下限
+    assert len(sleeps) == 2 and all(delay >= 2 for delay in sleeps)
+    assert result['retry_backoff'] == round(sum(sleeps), 3)
+
+
+def test_retry_stops_at_attempt_cap(sleeps):
+    policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+    analyzer = FlakyAnalyzer([TRANSIENT] * 5, retry_policy=policy)
+    result = analyzer.fetch_gift_link('https://163cn.tv/a', RESOLUTION)
+    assert result['status'] == 'api_exception'
+    assert analyzer.attempts == 2
+    assert result['retry_count'] == 1
+
+
+def test_retry_stops_when_budget_is_exhausted(sleeps):
+    policy = RetryPolicy(max_attempts=5, base_delay=0.01, budget=RetryBudget(ratio=0, min_retries=1))
+    analyzer = FlakyAnalyzer([TRANSIENT] * 10, retry_policy=policy)
+    first = analyzer.fetch_gift_link('https://163cn.tv/a', RESOLUTION)
+    second = analyzer.fetch_gift_link('https://163cn.tv/b', RESOLUTION)
+    assert first['retry_count'] == 1
+    assert second['retry_count'] == 0
+    assert analyzer.attempts == 3
+    assert policy.budget.stats()['rejected'] == 2
+
+
+def test_no_retry_fields_without_policy():
+    analyzer = FlakyAnalyzer([TRANSIENT])
+    result = analyzer.fetch_gift_link('https://163cn.tv/a', RESOLUTION)
+    assert analyzer.attempts == 1
+    assert 'retry_count' not in result
+
+
+def test_key_pool_fills_and_round_robins():
+    encryption = NetEaseEncryption()
+    pool = EncSecKeyPool(encryption, size=3)
+    assert len(pool.pairs) == 3
+    assert len({random_str for random_str, _ in pool.pairs}) == 3
+    for random_str, enc_sec_key in pool.pairs:
+        assert enc_sec_key == encryption.rsa_encrypt(random_str, encryption.public_key, encryption.modulus)
+    assert [pool.get() for _ in range(6)] == pool.pairs * 2
+
+
+def test_key_pool_refresh_replaces_oldest_pair():
+    pool = EncSecKeyPool(NetEaseEncryption(), size=3)
+    oldest, *rest = pool.pairs
+    pool.refresh_one()
+    assert len(pool.pairs) == 3
+    assert oldest not in pool.pairs
+    assert pool.pairs[:2] == rest
+
+
+def test_key_pool_background_refresh_stops():
+    pool = EncSecKeyPool(NetEaseEncryption(), size=2, refresh_interval=0.01)
+    initial = list(pool.pairs)
+    deadline = time.monotonic() + 2
+    while pool.pairs == initial and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pool.stop_refresh()
+    assert pool.pairs != initial
+    assert pool._refresh_thread is None
+
+
+def test_pooled_encryption_uses_pool_keys():
+    encryption = NetEaseEncryption(key_pool_size=2)
+    keys = {pair[1] for pair in encryption.key_pool.pairs}
+    results = [encryption.encrypt_params('{"a": 1}') for _ in range(4)]
+    assert {result['encSecKey'] for result in results} == keys
+    batch = encryption.encrypt_params_many(['{"a": 1}', {'a': 1}])
+    assert batch[0] == batch[1]
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""page_scan 页面扫描测试"""
+
+import asyncio
+import json
+import re
+import time
+
+import page_scan
+from page_scan import (EXPIRE_STOP_PATTERN, ExpireTimeExtractor, ExtractionStrategyCache, bracket_depth_change, decode_json_value, extract_expire_field,
+                       find_state_value, read_until_async, strip_json_strings)
+
+
+def test_patterns_avoid_python311_only_syntax():
+    """占有量词和原子分组需要 Python 3.11+，模块内的正则不能使用"""
+    for value in vars(page_scan).values():
+        if isinstance(value, re.Pattern):
+            pattern = value.pattern if isinstance(value.pattern, str) else value.pattern.decode('latin-1')
+            assert not re.search(r'[*+?}]\+|\(\?>', pattern), pattern
+
+
+def test_strip_json_strings_with_escaped_quotes():
+    assert strip_json_strings(b'a "x\\"y" b "c"') == b'a  b '
+    assert strip_json_strings(b'a "open \\" string') is None
+
+
+def test_bracket_depth_change():
+    assert bracket_depth_change(b'') == (0, 0)
+    assert bracket_depth_change(b'{"a": [1, {}]}') == (0, 0)
+    assert bracket_depth_change(b'}]{{') == (0, -2)
+    assert bracket_depth_change(b'{}}') == (-1, -1)
+
+
+def test_bracket_depth_change_is_linear_in_nesting_depth():
+    depth = 200000
+    start = time.perf_counter()
+    assert bracket_depth_change(b'{' * depth + b'}' * depth) == (0, 0)
+    assert bracket_depth_change(b'}' * depth + b'{' * depth) == (0, -depth)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_find_state_value_skips_keys_inside_strings_and_nested_objects():
+    state = {
+        'note': '"gift": {"fake": 1}',
+        'deep': {'gift': {'nested': True}},
+        'gift': {'status': 'ok'},
+    }
+    html = b'<script>window.__INITIAL_STATE__ = ' + json.dumps(state).encode() + b';</script>'
+    assert find_state_value(html, max_depth=1) == {'status': 'ok'}
+    assert find_state_value(html) == {'nested': True}
+
+
+def test_find_state_value_stops_at_end_of_state_object():
+    html = b'<script>window.__INITIAL_STATE__ = {"other": 1};</script><script>var x = {"gift": 2};</script>'
+    assert find_state_value(html) is None
+
+
+class FakeContent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.content = FakeContent(chunks)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def read_page(chunks):
+    return asyncio.run(read_until_async(FakeResponse(chunks), EXPIRE_STOP_PATTERN, chunk_size=16))
+
+
+def test_stream_does_not_stop_on_lower_priority_expire_keys():
+    """expire_time、tokenExpireTime 在前时不能提前停止，否则会截掉后面的 expireTime"""
+    chunks = [
+        b'{"expire_time": 1111111111111, "tokenExpireTime": 1222222222222}',
+        b'<div>' + b' ' * 1024 + b'</div>',
+        b'{"expireTime": 1999999999999}',
+        b'<tail/>',
+    ]
+    html, hit = read_page(chunks)
+    assert hit
+    assert not html.endswith(b'<tail/>')
+    assert extract_expire_field(html) == 1999999999999
+
+
+def test_stream_falls_back_to_token_expire_time():
+    html, hit = read_page([b'tokenExpireTime=1222222222222;', b'<tail/>'])
+    assert not hit
+    assert extract_expire_field(html) == 1222222222222
+    assert extract_expire_field(b'no timestamp here') is None
+
+
+class RecordingDecoder:
+    """记录每次解码的文本长度"""
+
+    def __init__(self):
+        self.lengths = []
+
+    def raw_decode(self, text):
+        self.lengths.append(len(text))
+        return json.JSONDecoder().raw_decode(text)
+
+
+def test_decode_json_value_retries_only_truncated_values(monkeypatch):
+    decoder = RecordingDecoder()
+    monkeypatch.setattr(page_scan, '_JSON_DECODER', decoder)
+    padding = b' ' * 10000
+
+    # 值本身不合法：只解码窗口，不再解码到 end
+    html = b'undefined, "x": 1}' + padding
+    assert decode_json_value(html, 0, len(html), window=100) is None
+    assert decoder.lengths == [100]
+
+    # 值超出窗口：解码到 end
+    decoder.lengths.clear()
+    html = b'{"name": "' + b'a' * 500 + b'"}' + padding
+    assert decode_json_value(html, 0, len(html), window=100) == {'name': 'a' * 500}
+    assert decoder.lengths == [100, len(html)]
+
+    decoder.lengths.clear()
+    html = b'[1, 2, ' + b'3, ' * 100 + b'4]' + padding
+    assert decode_json_value(html, 0, len(html), window=100) == [1, 2] + [3] * 100 + [4]
+    assert decoder.lengths == [100, len(html)]
+
+    decoder.lengths.clear()
+    html = b'{"a": ' + b' ' * 92 + b'true}' + padding
+    assert decode_json_value(html, 0, len(html), window=100) == {'a': True}
+    assert decoder.lengths == [100, len(html)]
+
+    # 窗口内完整的值只解码一次
+    decoder.lengths.clear()
+    html = b'{"a": 1}' + padding
+    assert decode_json_value(html, 0, len(html), window=100) == {'a': 1}
+    assert decoder.lengths == [100]
+
+
+class CountingExtractor(ExpireTimeExtractor):
+    """记录完整扫描的次数"""
+
+    def __init__(self):
+        super().__init__()
+        self.full_scans = 0
+
+    def locate(self, content, now=None):
+        self.full_scans += 1
+        return super().locate(content, now)
+
+
+def vip_page(expire_time, padding=0):
+    return b'<html>' + b' ' * padding + b'<script>var cfg = {"expireTime": %d};</script>' % expire_time
+
+
+def test_strategy_cache_reuses_pattern_and_position():
+    extractor = CountingExtractor()
+    cache = ExtractionStrategyCache(extractor)
+    first = cache.extract('act1', vip_page(1999999999999))
+    # 同一模板的页面位置稍有偏移，仍按记录的模式和位置命中，不做完整扫描
+    second = cache.extract('act1', vip_page(1888888888888, padding=100))
+    assert first == (1999999999999, '模式2')
+    assert second == (1888888888888, '模式2')
+    assert extractor.full_scans == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_strategy_cache_falls_back_to_full_scan():
+    extractor = CountingExtractor()
+    cache = ExtractionStrategyCache(extractor)
+    cache.extract('act1', vip_page(1999999999999))
+    # 模板变化后记录的模式不再命中，完整扫描并更新策略
+    page = b'tokenExpireTime=1777777777777;'
+    assert cache.extract('act1', page) == ExpireTimeExtractor().extract(page)
+    assert extractor.full_scans == 2
+    assert cache.stats()['misses'] == 2
+
+
+def test_strategy_cache_without_activity_or_with_eviction():
+    cache = ExtractionStrategyCache(max_entries=2)
+    cache.extract(None, vip_page(1999999999999))
+    assert cache.stats()['activities'] == 0
+    for activity_id in ('a', 'b', 'c'):
+        cache.extract(activity_id, vip_page(1999999999999))
+    assert list(cache.strategies) == ['b', 'c']
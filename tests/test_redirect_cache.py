@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""RedirectCache 重定向缓存测试"""
+
+from link_resolution import normalize_short_url
+from redirect_cache import RedirectCache
+
+
+def accessed_at(cache, short_url):
+    key = normalize_short_url(short_url)
+    return cache.conn.execute('SELECT accessed_at FROM redirects WHERE short_url = ?', (key,)).fetchone()[0]
+
+
+def test_hits_do_not_write_until_flushed(tmp_path):
+    cache = RedirectCache(str(tmp_path / 'cache.db'), access_flush_size=3)
+    cache.put('https://163cn.tv/a', 302, 'https://example.com/a')
+    stored_at = accessed_at(cache, 'https://163cn.tv/a')
+
+    changes = cache.conn.total_changes
+    assert cache.get('https://163cn.tv/a') == (302, 'https://example.com/a')
+    assert cache.get('https://163cn.tv/missing') is None
+    assert cache.conn.total_changes == changes
+    assert accessed_at(cache, 'https://163cn.tv/a') == stored_at
+
+    cache.get('https://163cn.tv/a')
+    cache.get('https://163cn.tv/a')
+    assert accessed_at(cache, 'https://163cn.tv/a') == stored_at
+    cache.flush()
+    assert accessed_at(cache, 'https://163cn.tv/a') > stored_at
+    assert cache.stats()['hits'] == 3
+    cache.close()
+
+
+def test_close_persists_entries_and_is_idempotent(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = RedirectCache(path)
+    cache.put('https://163cn.tv/a', 301, 'https://example.com/a')
+    cache.get('https://163cn.tv/a')
+    cache.close()
+    cache.close()
+
+    reopened = RedirectCache(path)
+    assert reopened.get('https://163cn.tv/a') == (301, 'https://example.com/a')
+    reopened.close()
+
+
+def test_equivalent_short_urls_share_one_entry(tmp_path):
+    cache = RedirectCache(str(tmp_path / 'cache.db'))
+    cache.put(' http://163CN.tv/AbC/ ', 302, 'https://example.com/a')
+    assert cache.get('https://163cn.tv/AbC') == (302, 'https://example.com/a')
+    assert cache.get('163cn.tv/AbC') == (302, 'https://example.com/a')
+    # 路径区分大小写
+    assert cache.get('https://163cn.tv/abc') is None
+    assert cache.size() == 1
+    cache.close()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""result_cache 结果缓存测试"""
+
+from result_cache import ResultCache
+
+
+def make_result(gift_status, status='success'):
+    return {'short_url': 'https://163cn.tv/a', 'status': status, 'gift_status': gift_status, 'gift_type': '黑胶VIP'}
+
+
+def test_terminal_results_never_expire():
+    cache = ResultCache(available_ttl=10)
+    assert cache.put('a', make_result('expired'), now=0)
+    cached = cache.get('a', now=10 ** 9)
+    assert cached['gift_status'] == 'expired'
+    assert cached['from_cache'] is True
+
+
+def test_available_results_expire_after_ttl():
+    cache = ResultCache(available_ttl=10)
+    cache.put('a', make_result('available'), now=0)
+    assert cache.get('a', now=9) is not None
+    assert cache.get('a', now=10) is None
+    # 过期条目仍可通过 peek 读取
+    assert cache.peek('a')[1] == 0
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_failures_are_not_cached():
+    cache = ResultCache()
+    assert not cache.put('a', make_result('unknown', status='api_exception'))
+    assert not cache.put('a', None)
+    assert cache.get('a') is None
+
+
+def test_returns_independent_copies():
+    cache = ResultCache()
+    result = make_result('claimed')
+    result['from_cache'] = True
+    cache.put('a', result)
+    cached = cache.get('a')
+    cached['gift_status'] = 'changed'
+    assert cache.get('a')['gift_status'] == 'claimed'
+    assert 'from_cache' not in cache.peek('a')[0]
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', make_result('expired'))
+    cache.put('b', make_result('expired'))
+    cache.get('a')
+    cache.put('c', make_result('expired'))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['size'] == 2
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""ResultStore 列式统计测试"""
+
+import pytest
+
+import result_store
+from result_store import ResultStore, ResultList
+from optimal_gift_analyzer import OptimalGiftAnalyzer
+
+RESULTS = [
+    {'status': 'success', 'gift_status': 'available', 'gift_type': 'A', 'gift_price': 15, 'short_url': 'u1'},
+    {'status': 'success', 'gift_status': 'expired', 'gift_type': 'B', 'gift_price': 5, 'short_url': 'u2',
+     'is_vip_link': True, 'vip_status': 'expired', 'vip_expiry_check': {'method': 'page'}},
+    {'status': 'api_exception', 'error_category': 'timeout', 'short_url': 'u3'},
+    {'status': 'success', 'gift_status': 'claimed', 'gift_type': 'A', 'gift_price': 15, 'short_url': 'u4'},
+    {'status': 'error', 'short_url': 'u5'},
+    {'status': 'success', 'gift_status': 'available', 'gift_type': 'A', 'gift_price': 30, 'short_url': 'u6'},
+]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(result_store, 'np', None)
+    return request.param
+
+
+def test_statistics_match_list_implementation(backend):
+    analyzer = OptimalGiftAnalyzer()
+    expected = analyzer.collect_statistics(RESULTS)
+    actual = analyzer.collect_statistics(ResultStore(RESULTS))
+    assert actual == expected
+    assert expected['success_count'] == 4
+    assert expected['available_value'] == 45
+
+
+def test_masks_and_selection(backend):
+    store = ResultStore(RESULTS)
+    success = store.where('status', 'success')
+    available = success & store.where('gift_status', 'available')
+    assert store.select('short_url', available) == ['u1', 'u6']
+    assert store.select('short_url', store.negate(success)) == ['u3', 'u5']
+    assert store.take(store.where('status', 'missing')) == []
+    assert store.value_counts('vip_method', store.where('is_vip_link', True)) == {'page': 1}
+    assert store.value_counts('error_category', store.where('status', 'api_exception')) == {'timeout': 1}
+
+
+def test_many_distinct_categories_do_not_overflow(backend):
+    store = ResultStore({'status': 'success', 'gift_type': f'type-{i}'} for i in range(70000))
+    counts = store.value_counts('gift_type', store.where('status', 'success'))
+    assert len(counts) == 70000
+    assert store.select('gift_type', store.where('gift_type', 'type-69999')) == ['type-69999']
+
+
+def test_result_list_version_tracks_in_place_changes():
+    results = ResultList(RESULTS)
+    version = results.version
+    results.append({'status': 'error'})
+    assert results.version == version
+    results[0] = {'status': 'error'}
+    assert results.version == version + 1
+    del results[0]
+    results.sort(key=lambda r: r['status'])
+    assert results.version == version + 3
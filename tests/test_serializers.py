@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""serializers 结果序列化测试"""
+
+import json
+
+import pytest
+
+import serializers
+from gift_result import GiftResult
+
+RESULTS = [
+    {'short_url': 'https://163cn.tv/a', 'status': 'success', 'gift_type': '黑胶VIP', 'gift_price': 15.0},
+    GiftResult({'short_url': 'https://163cn.tv/b', 'status': 'invalid', 'extra': {'1': [1, 2]}}),
+]
+EXPECTED = [
+    {'short_url': 'https://163cn.tv/a', 'status': 'success', 'gift_type': '黑胶VIP', 'gift_price': 15.0},
+    {'short_url': 'https://163cn.tv/b', 'status': 'invalid', 'extra': {'1': [1, 2]}},
+]
+
+
+@pytest.fixture(params=['default', 'json'])
+def backend(request, monkeypatch):
+    """分别在当前安装的后端和标准库 json 后备实现下运行"""
+    if request.param == 'json':
+        monkeypatch.setattr(serializers, 'orjson', None)
+        monkeypatch.setattr(serializers, 'ujson', None)
+    return request.param
+
+
+def test_json_round_trip(backend, tmp_path):
+    path = tmp_path / 'results.json'
+    serializers.save_results(RESULTS, path)
+    assert serializers.load_results(path) == EXPECTED
+    assert '黑胶VIP' in path.read_text(encoding='utf-8')
+
+
+def test_json_output_matches_stdlib(backend):
+    # GiftResult 按字段顺序输出，与转换成dict后用标准库序列化的结果逐字节一致
+    records = [dict(result) for result in RESULTS]
+    expected = json.dumps(records, ensure_ascii=False, indent=2).encode('utf-8')
+    assert serializers.json_dumps(RESULTS, pretty=True) == expected
+
+
+def test_unknown_type_raises_type_error(backend):
+    with pytest.raises(TypeError):
+        serializers.json_dumps({'value': object()})
+
+
+def test_invalid_json_raises_decode_error():
+    with pytest.raises(serializers.JSONDecodeError):
+        serializers.json_loads(b'{"a": ')
+
+
+def test_detect_format():
+    assert serializers.detect_format('out.msgpack') == 'msgpack'
+    assert serializers.detect_format('OUT.MPK') == 'msgpack'
+    assert serializers.detect_format('out.json') == 'json'
+
+
+@pytest.mark.skipif(not serializers.MSGPACK_AVAILABLE, reason='未安装 msgpack')
+def test_msgpack_round_trip(tmp_path):
+    path = tmp_path / 'results.msgpack'
+    serializers.save_results(RESULTS, path)
+    assert serializers.load_results(path) == EXPECTED
+
+
+def test_msgpack_missing_raises_runtime_error(monkeypatch, tmp_path):
+    monkeypatch.setattr(serializers, 'msgpack', None)
+    with pytest.raises(RuntimeError):
+        serializers.save_results(RESULTS, tmp_path / 'results.msgpack')
+    with pytest.raises(RuntimeError):
+        serializers.msgpack_loads(b'\x90')